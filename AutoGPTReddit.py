@@ -1,19 +1,87 @@
 import http.client
-import json
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import praw
 import praw.exceptions
 import prawcore
+from praw.endpoints import API_PATH
 from praw.models import MoreComments
 
+from . import deadline
+from .account_pool import Account, AccountPool
+from .budget import TokenBudget
+from .cache import TTLCache
+from .cassette import CassetteRecorder
+from .deadline import Deadlines, gather
+from .discovery import SubredditDiscovery
+from .embeddings import HashingEmbedder, comment_text, post_text
+from .encoding import FORMATS, compact_response
+from .ledger import ActivityLedger, utc_day
+from .profiling import CommandProfiler
+from .prefetch import within_budget
+from .profiles import ProfileTracker
+from .records import comment_record, message_record, submission_record
+from .search_index import LocalSearchIndex
+from .serialization import CommandResult, dumps, loads
+from .shared_state import SharedCache, SharedState
+from .settings import data_dir, env_bool, env_float, env_int, env_list
+from .subreddit_cache import DEFAULT_TTL, SubredditMetadataCache
+from .summarizer import ThreadSummarizer
+from .thread_tracker import ThreadTracker
+from .transport import ResilientRequestor, disable_session_retries
+
+SCENEX_TIMEOUT = 30  # Seconds, unless the command's deadline is sooner
+
 
 class AutoGPTReddit:
     SUCCESS = "success"
     ERROR = "error"
-    TRUNCATION_LIMIT = 200  # Constant for truncation limit
+    SEARCH_SCOPES = ("local", "remote", "hybrid")
+    # Methods the plugin registers as commands, each taking an ``args`` dict
+    COMMANDS = (
+        "fetch_posts",
+        "fetch_new_since",
+        "fetch_comments",
+        "fetch_items",
+        "submit_comment",
+        "submit_post",
+        "vote",
+        "vote_batch",
+        "fetch_notifications",
+        "triage_inbox",
+        "fetch_user_profile",
+        "fetch_own_activity",
+        "search_posts",
+        "search_comments",
+        "subscribe_subreddit",
+        "get_subscribed_subreddits",
+        "get_subreddit_info",
+        "get_popular_subreddits",
+        "get_account_pool_status",
+        "read_notification",
+        "fetch_and_describe_image_post",
+        "fetch_comment_tree",
+        "respond_to_notification",
+        "fetch_post_details",
+    )
+    # Set by the cassette replay runner to answer requests from a recording
+    requestor_class = ResilientRequestor
+    requestor_options = {}
+    # Items fetched per item returned when ranking by relevance to a goal
+    GOAL_CANDIDATES = 3
+    # Fullnames /api/read_message and /api/unread_message take per request
+    MARK_BATCH = 25
+    # Arguments naming the items a command writes to; pre_command resolves
+    # them into a ``context`` argument so the command skips loading them
+    ENRICHMENT = {
+        "submit_comment": ("parent_id",),
+        "vote": ("id",),
+    }
+    # The ``likes`` value each vote action leaves on an item
+    VOTE_LIKES = {"upvote": True, "downvote": False, "clear": None}
     rate_limit_reset_time = None
 
     @classmethod
@@ -27,6 +95,125 @@ class AutoGPTReddit:
         response["status"] = AutoGPTReddit.ERROR
         response["error_message"] = message
 
+    def _item_from_id(self, item_id, reddit=None):
+        # Accept fullnames (t1_/t3_) as well as bare submission ids
+        reddit = reddit or self.reddit
+        if item_id.startswith("t1_"):
+            return reddit.comment(id=item_id[3:])
+        if item_id.startswith("t3_"):
+            return reddit.submission(id=item_id[3:])
+        return reddit.submission(id=item_id)
+
+    def _reader(self):
+        # Reads that do not depend on the account are spread over the pool
+        return self.accounts.reader().reddit
+
+    def within_budget(self, reserve, account=None):
+        # Background reads check the account they will use, by default the
+        # next reader, and with shared state the requests of other processes
+        account = account or self.accounts.next_reader()
+        return within_budget(
+            account.reddit, reserve, self.shared, account.username.lower()
+        )
+
+    def _writer_for(self, item, context=None):
+        # Posts are their own thread, comments belong to their post's thread
+        if len(self.accounts) == 1:
+            return self.accounts.primary, None
+        thread = item.fullname
+        if item.fullname.startswith("t1_"):
+            # A record resolved by pre_command saves loading the comment
+            record = (context or {}).get(item.fullname)
+            thread = record["link_id"] if record else item.link_id
+        return self.accounts.writer(thread), thread
+
+    def enrich(self, command, arguments, timeout):
+        """Resolves the items ``command`` acts on into ``arguments["context"]``.
+
+        Items already fetched come from the local index, the rest from one
+        /api/info request on the executor that is given ``timeout`` seconds.
+        Whatever is not resolved in time is left out and the command looks it
+        up itself; a late lookup still lands in the index for next time.
+        """
+        names = AutoGPTReddit.ENRICHMENT.get(command)
+        # Only pooled writes need the thread of an item
+        if not names or len(self.accounts) == 1:
+            return arguments
+        context, missing = {}, []
+        for name in names:
+            if not isinstance(arguments.get(name), str):
+                continue
+            fullname = self._fullname(arguments[name])
+            record = self.search_index.get(fullname)
+            if record is not None:
+                context[fullname] = record
+            else:
+                missing.append(fullname)
+        if missing:
+            future = self.executor.submit(self._lookup_records, missing)
+            try:
+                context.update(future.result(timeout=timeout))
+            except Exception as e:
+                print(f"Reddit context lookup skipped: {e!r}")
+        if not context:
+            return arguments
+        return {**arguments, "context": context}
+
+    def _lookup_records(self, fullnames):
+        items = self._info(self._reader(), fullnames)
+        posts = [submission_record(i) for i in items.values() if i.fullname[:2] == "t3"]
+        comments = [comment_record(i) for i in items.values() if i.fullname[:2] == "t1"]
+        self.search_index.add_posts(posts)
+        self.search_index.add_comments(comments)
+        return {record["fullname"]: record for record in posts + comments}
+
+    def _result(self, response):
+        # Listings leave in the output format; ``payload`` stays plain JSON
+        shown = compact_response(response, self.output_format)
+        return CommandResult(response, None if shown is response else shown)
+
+    def _write_blocked(self, response, account):
+        self.accounts.sync()
+        if account.can_write():
+            return False
+        wait = max(account.rate_limited_until, account.resting_until) - time.time()
+        self.set_error_response(
+            response,
+            f"u/{account.username} writes in this thread and cannot write for "
+            f"another {int(wait)} seconds",
+        )
+        return True
+
+    def _rate_limited(self, account, seconds):
+        self.accounts.rate_limited(account, seconds)
+        # Commands are only reported as rate limited once no account can write
+        AutoGPTReddit.rate_limit_reset_time = self.accounts.write_available_at()
+
+    def _record_activity(self, action, **entry):
+        self.ledger.record(action, **entry)
+        if self.ledger.reconcile_due():
+            self._reconcile_ledger()
+
+    def _reconcile_ledger(self):
+        future = self.executor.submit(self.ledger.reconcile, self.reddit)
+        future.add_done_callback(AutoGPTReddit._reconciled)
+
+    @staticmethod
+    def _reconciled(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Reddit ledger reconciliation failed: {future.exception()!r}")
+
+    def _repeated(self, response, key, previous, message):
+        # Earlier writes from the ledger are reported to the agent; they are
+        # only refused with REDDIT_REFUSE_REPEATS
+        if not previous:
+            return False
+        response[key] = [entry["id"] for entry in previous]
+        if not self.refuse_repeats:
+            return False
+        self.set_error_response(response, message)
+        return True
+
     def seconds_to_detailed_time(seconds):
         days = seconds // 86400
         hours = (seconds % 86400) // 3600
@@ -50,118 +237,433 @@ class AutoGPTReddit:
         reddit_username,
         reddit_password,
     ):
-        self.reddit = praw.Reddit(
+        self.user_agent = reddit_user_agent
+        # Agents on one host share rate limits, cached responses and fetches
+        self.shared = None
+        if env_bool("REDDIT_SHARED_STATE"):
+            self.shared = SharedState(os.path.join(data_dir(), "shared-state.sqlite3"))
+        # Each client's ResilientRequestor by username, for its request stats
+        self.requestors = {}
+        # REDDIT_RECORD=<file> records the session into a cassette
+        self.recorder = None
+        if os.getenv("REDDIT_RECORD"):
+            self.recorder = CassetteRecorder(
+                os.path.expanduser(os.getenv("REDDIT_RECORD")),
+                username=reddit_username,
+                user_agent=reddit_user_agent,
+            )
+        self.reddit = self._create_client(
             client_id=reddit_app_id,
             client_secret=reddit_app_secret,
-            user_agent=reddit_user_agent,
             username=reddit_username,
             password=reddit_password,
+        )
+        # "columns" or "tsv" lists field names once instead of on every row
+        self.output_format = os.getenv("REDDIT_OUTPUT_FORMAT", "json").lower()
+        if self.output_format not in FORMATS:
+            print(f"Unknown REDDIT_OUTPUT_FORMAT {self.output_format}, using json.")
+            self.output_format = "json"
+        # Output of every command is fitted into a per-command token budget
+        self.budget = TokenBudget.from_env(self.output_format)
+        # Long threads can be returned as an extractive summary instead
+        self.summarizer = ThreadSummarizer(self.budget.count)
+        # Listings and search results can be ranked by relevance to a goal
+        self.embedder = HashingEmbedder(env_int("REDDIT_EMBEDDING_DIM", 1024))
+        self.min_relevance = env_float("REDDIT_MIN_RELEVANCE", 0.0) or None
+        # Every post and comment a command returns is indexed for local search
+        self.search_index = LocalSearchIndex()
+        self.subreddit_cache = SubredditMetadataCache(
+            self.reddit, ttl=env_int("REDDIT_SUBREDDIT_CACHE_TTL", DEFAULT_TTL)
+        )
+        self.discovery = SubredditDiscovery(
+            self.reddit,
+            self.subreddit_cache,
+            ttl=env_int("REDDIT_POPULAR_TTL", 1800),
+        )
+        # Shared pool for the requests a single command issues concurrently
+        self.executor = ThreadPoolExecutor(
+            max_workers=env_int("REDDIT_MAX_WORKERS", 4),
+            thread_name_prefix="reddit",
+        )
+        # Listings and the unread inbox, kept warm by the optional PrefetchWorker.
+        # What a command fetches itself is only reused with a listing or inbox TTL.
+        self.listing_cache = self._cache("listings", env_int("REDDIT_LISTING_TTL", 0))
+        self.inbox_cache = self._cache(
+            f"inbox:{reddit_username.lower()}", env_int("REDDIT_INBOX_TTL", 0)
+        )
+        self.parent_cache = self._cache("parents", 3600, maxsize=500)
+        # Loaded threads and unread inbox items warmed for the likely next command
+        speculate_ttl = env_int("REDDIT_SPECULATE_TTL", 120)
+        self.submission_cache = TTLCache(ttl=speculate_ttl, maxsize=50)
+        self.notification_cache = TTLCache(ttl=speculate_ttl, maxsize=200)
+        # Set by the plugin when REDDIT_SPECULATE is enabled
+        self.speculation = None
+        # Unread items matching these rules are marked read whenever the
+        # inbox is listed, so they never reach fetch_notifications
+        self.triage_rules = (
+            env_float("REDDIT_TRIAGE_OLDER_THAN_DAYS", 0),
+            env_list("REDDIT_TRIAGE_AUTHORS"),
+        )
+        self.profiles = ProfileTracker(self.reddit, self.executor, self.search_index)
+        # Last state of each read thread, for the ``delta`` mode of re-reads
+        self.threads = ThreadTracker()
+        # Set by the plugin when REDDIT_WATCH_SUBREDDITS is configured
+        self.streamer = None
+        # Local record of our own actions, so checking them costs no requests
+        self.ledger = ActivityLedger(
+            os.path.join(data_dir(), f"ledger-{reddit_username}.jsonl"),
+            reconcile_interval=env_int("REDDIT_LEDGER_RECONCILE_INTERVAL", 3600),
+        )
+        # Replies and posts repeating earlier ones are reported, not refused
+        self.refuse_repeats = env_bool("REDDIT_REFUSE_REPEATS")
+        # Extra accounts from REDDIT_ACCOUNTS_FILE share the read and write load
+        self.accounts = AccountPool.from_file(
+            Account(reddit_username, self.reddit),
+            os.getenv("REDDIT_ACCOUNTS_FILE"),
+            self._create_client,
+            write_policy=os.getenv("REDDIT_WRITE_POLICY", "sticky"),
+            shared_state=self.shared,
+        )
+        for thread, username in self.ledger.threads().items():
+            self.accounts.assign(thread, username)
+        # REDDIT_DEADLINE and REDDIT_DEADLINE_<COMMAND> bound each command
+        Deadlines.from_env().wrap(self, self.COMMANDS)
+        # REDDIT_PROFILE=fetch_posts,search_posts (or "all") samples commands
+        profiled = env_list("REDDIT_PROFILE")
+        if profiled:
+            CommandProfiler(
+                profiled,
+                os.getenv("REDDIT_PROFILE_DIR") or os.path.join(data_dir(), "profiles"),
+                modes=env_list("REDDIT_PROFILE_MODE") or ["cpu"],
+                every=env_int("REDDIT_PROFILE_EVERY", 1),
+            ).wrap(self, self.COMMANDS)
+        if self.recorder is not None:
+            self.recorder.wrap(self, self.COMMANDS)
+
+    def _create_client(
+        self, client_id, client_secret, username, password, user_agent=None
+    ):
+        reddit = praw.Reddit(
+            client_id=client_id,
+            client_secret=client_secret,
+            user_agent=user_agent or self.user_agent,
+            username=username,
+            password=password,
             check_for_async=False,
+            # Transient errors are retried below PRAW instead of failing the command
+            requestor_class=self.requestor_class,
+            requestor_kwargs={
+                "retries": env_int("REDDIT_RETRIES", 3),
+                "backoff": env_float("REDDIT_BACKOFF", 0.5),
+                "failure_threshold": env_int("REDDIT_BREAKER_THRESHOLD", 5),
+                "reset_timeout": env_float("REDDIT_BREAKER_RESET", 30),
+                "hedge": env_bool("REDDIT_HEDGE"),
+                "shared_state": self.shared,
+                "account": username.lower(),
+                "registry": self.requestors,
+                "recorder": self.recorder,
+                **self.requestor_options,
+            },
         )
+        disable_session_retries(reddit)
+        return reddit
+
+    def _cache(self, namespace, ttl, maxsize=1024):
+        if self.shared is None:
+            return TTLCache(ttl=ttl, maxsize=maxsize)
+        return SharedCache(self.shared, namespace, ttl=ttl, maxsize=maxsize)
+
+    def _refresh_once(self, marker, refresh, cached):
+        # With shared state only one agent fetches; the others wait for its result
+        if self.shared is None:
+            return refresh()
+        if not self.shared.claim(marker):
+            self.shared.wait_released(marker, timeout=10)
+            value = cached()
+            if value is not None:
+                return value
+            return refresh()
+        try:
+            return refresh()
+        finally:
+            self.shared.release(marker)
+
+    @staticmethod
+    def _listing_key(subreddit_name, sort_by, time_filter):
+        if sort_by not in ("hot", "top", "new"):
+            sort_by = "hot"
+        if sort_by != "top":
+            time_filter = None
+        return subreddit_name.lower(), sort_by, time_filter
+
+    def refresh_listing(
+        self,
+        subreddit_name,
+        sort_by="hot",
+        limit=25,
+        time_filter="day",
+        ttl=None,
+        after=None,
+    ):
+        key = self._listing_key(subreddit_name, sort_by, time_filter)
+        subreddit = self._reader().subreddit(subreddit_name)
+        params = {"after": after} if after else None
+        if key[1] == "top":
+            posts = subreddit.top(limit=limit, time_filter=time_filter, params=params)
+        elif key[1] == "new":
+            posts = subreddit.new(limit=limit, params=params)
+        else:
+            posts = subreddit.hot(limit=limit, params=params)
+
+        # Pages stop coming once the command's deadline passes
+        records = gather(submission_record(post) for post in posts)
+        self.search_index.add_posts(records)
+        if not (records.partial or after) and (ttl or self.listing_cache.ttl):
+            self.listing_cache.set(key, (limit, records), ttl)
+        return records
+
+    def _listing_records(self, subreddit_name, sort_by, limit, time_filter, after):
+        if after:
+            # Resuming a partial listing, which is never cached
+            return self.refresh_listing(
+                subreddit_name, sort_by, limit, time_filter, after=after
+            )
+        key = self._listing_key(subreddit_name, sort_by, time_filter)
+        if key[1] == "new" and self.streamer:
+            # Watched subreddits serve their newest posts from the stream buffer
+            records = self.streamer.latest_posts(subreddit_name, limit)
+            if records is not None:
+                return self._with_current_scores(records)
+
+        # Serve from the cache if a fresh listing at least this long is there
+        def cached_records():
+            cached = self.listing_cache.get(key)
+            if cached is not None and cached[0] >= limit:
+                return cached[1][:limit]
+            return None
+
+        records = cached_records()
+        if records is not None:
+            return records
+        return self._refresh_once(
+            f"listing:{key}",
+            lambda: self.refresh_listing(subreddit_name, sort_by, limit, time_filter),
+            cached_records,
+        )
+
+    def _with_current_scores(self, records):
+        # Buffered posts keep the score they had when streamed in; one
+        # /api/info request per 100 posts brings them up to date
+        fullnames = [record["fullname"] for record in records]
+        current = [
+            submission_record(item)
+            for item in self._info(self._reader(), fullnames).values()
+        ]
+        self.search_index.add_posts(current)
+        current = {record["fullname"]: record for record in current}
+        return [current.get(record["fullname"], record) for record in records]
+
+    @staticmethod
+    def _partial(records):
+        return getattr(records, "partial", False) and len(records) > 0
+
+    @staticmethod
+    def _mark_partial(response, cursor):
+        # Pass ``after=cursor`` to the same command to continue
+        if cursor:
+            response["partial"] = True
+            response["cursor"] = cursor
+
+    def _candidates(self, limit, goal):
+        # A single listing page holds up to 100 items, so more cost nothing
+        if not goal:
+            return limit
+        return max(limit, min(100, limit * AutoGPTReddit.GOAL_CANDIDATES))
+
+    def _rank_by_goal(self, goal, records, text_of, limit):
+        # The most relevant records, and their relevance by fullname
+        ranked = self.embedder.rank(goal, records, text_of, self.min_relevance)
+        ranked = ranked[:limit]
+        relevance = {record["fullname"]: round(score, 3) for record, score in ranked}
+        return [record for record, _ in ranked], relevance
 
     def fetch_posts(self, args) -> str:
         response = {"status": "success"}
-        char_count = 0
         try:
             subreddit_name = args.get("subreddit", "all")
             sort_by = args.get("sort_by", "hot")
             limit = args.get("limit", 20)
             time_filter = args.get("time_filter", "day")
-
-            subreddit = self.reddit.subreddit(subreddit_name)
-            if sort_by == "hot":
-                posts = subreddit.hot(limit=limit)
-            elif sort_by == "top":
-                posts = subreddit.top(limit=limit, time_filter=time_filter)
-            elif sort_by == "new":
-                posts = subreddit.new(limit=limit)
-            else:
-                posts = subreddit.hot(limit=limit)
+            goal = args.get("goal")
+
+            posts = self._listing_records(
+                subreddit_name,
+                sort_by,
+                self._candidates(limit, goal),
+                time_filter,
+                args.get("after"),
+            )
+            # Where Reddit's listing stopped, if the deadline cut it short
+            cursor = posts[-1]["fullname"] if self._partial(posts) else None
+            if goal:
+                posts, relevance = self._rank_by_goal(goal, posts, post_text, limit)
 
             output = []
             current_time = time.time()
             for post in posts:
-                if post.is_self or (not post.is_self and post.url):
-                    text = (
-                        post.selftext[:200] + "..."
-                        if len(post.selftext) > 200
-                        else post.selftext
-                    )
+                if post["is_self"] or (not post["is_self"] and post["url"]):
                     age = (
-                        current_time - post.created_utc
+                        current_time - post["created_utc"]
                     )  # Calculate the age of the post
                     detailed_age = AutoGPTReddit.seconds_to_detailed_time(
                         age
                     )  # Format the age
                     post_info = {
-                        "id": post.id,
-                        "title": post.title,
-                        "text": text,
-                        "score": post.score,
-                        "comments_count": post.num_comments,
+                        "id": post["id"],
+                        "title": post["title"],
+                        "text": post["selftext"],
+                        "score": post["score"],
+                        "comments_count": post["num_comments"],
                         "age": detailed_age,
                     }
+                    if goal:
+                        post_info["relevance"] = relevance[post["fullname"]]
                     output.append(post_info)
-                    char_count += len(json.dumps(post_info))
-                    if char_count >= 2500:
-                        break
 
-            response["data"] = output
+            response["data"] = self.budget.fit(
+                "fetch_posts", output, ["text"], listing=True
+            )
+            self._mark_partial(response, cursor)
+        except Exception as e:
+            response["status"] = "error"
+            response["message"] = str(e)
+
+        return self._result(response)
+
+    def fetch_new_since(self, args) -> str:
+        response = {"status": "success"}
+        try:
+            subreddit_name = args["subreddit"]
+            kind = args.get("kind", "posts")
+            limit = args.get("limit", 10)
+            unseen = None
+            if self.streamer and kind in ("posts", "comments"):
+                unseen = self.streamer.since_last_seen(subreddit_name, kind, limit)
+            if unseen is None:
+                self.set_error_response(
+                    response, f"r/{subreddit_name} {kind} are not being watched"
+                )
+                return self._result(response)
+
+            items, remaining = unseen
+            current_time = time.time()
+            output = []
+            for item in items:
+                age = AutoGPTReddit.seconds_to_detailed_time(
+                    current_time - item["created_utc"]
+                )
+                if kind == "posts":
+                    output.append(
+                        {"id": item["id"], "title": item["title"], "age": age}
+                    )
+                else:
+                    output.append(
+                        {
+                            "id": item["id"],
+                            "post_id": item["link_id"],
+                            "content": item["body"],
+                            "age": age,
+                        }
+                    )
+            response["data"] = self.budget.fit(
+                "fetch_new_since", output, ["title", "content"], listing=True
+            )
+            response["unseen_remaining"] = remaining
         except Exception as e:
             response["status"] = "error"
             response["message"] = str(e)
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def fetch_comments(self, args) -> str:
         response = {"status": "success"}
-        char_count = 0
         try:
             post_id = args.get("post_id")
             sort = args.get("sort_by", "best")
-            limit = args.get("limit", 10)
+            summarize = self._flag(args.get("summarize"))
+            # Summaries cover every loaded comment unless told otherwise
+            limit = args.get("limit", None if summarize else 10)
+            delta = self._flag(args.get("delta"))
+
+            comments = None
+            if sort == "new" and self.streamer:
+                # Watched subreddits already have the newest comments buffered
+                comments = self.streamer.comments_for(post_id, limit)
+
+            if comments is None:
+                submission = self._submission(post_id, sort)
+                if sort == "best":
+                    submission.comment_sort = "best"
+                elif sort == "new":
+                    submission.comment_sort = "new"
+                elif sort == "top":
+                    submission.comment_sort = "top"
+                if delta and sort == "new":
+                    # Only the newest comments can be new, so ask for no more
+                    submission.comment_limit = limit
+
+                submission.comments.replace_more(limit=0)
+                comments = [
+                    comment_record(comment)
+                    for comment in submission.comments.list()[:limit]
+                ]
+                self.search_index.add_comments(comments)
 
-            submission = self.reddit.submission(id=post_id)
-            if sort == "best":
-                submission.comment_sort = "best"
-            elif sort == "new":
-                submission.comment_sort = "new"
-            elif sort == "top":
-                submission.comment_sort = "top"
+            if delta:
+                changes = self.threads.diff(post_id, comments=comments)
+                comments = changes["new"]
 
-            submission.comments.replace_more(limit=0)
-            comments = submission.comments.list()[:limit]
+            if summarize:
+                response["data"] = self.summarizer.summarize(
+                    comments, self.budget.budget_for("fetch_comments")
+                )
+                return self._result(response)
 
             output = []
             current_time = time.time()
             for comment in comments:
                 age = (
-                    current_time - comment.created_utc
+                    current_time - comment["created_utc"]
                 )  # Calculate the age of the post
                 detailed_age = AutoGPTReddit.seconds_to_detailed_time(
                     age
                 )  # Format the age
                 comment_info = {
-                    "Comment ID": comment.id,
-                    "Content": comment.body[:200],
-                    "score": comment.score,
-                    "Author": str(comment.author),
+                    "Comment ID": comment["id"],
+                    "Content": comment["body"],
+                    "score": comment["score"],
+                    "Author": comment["author"],
                     "age": detailed_age,
                 }
                 output.append(comment_info)
-                char_count += len(json.dumps(comment_info))
-                if char_count >= 2500:
-                    break
 
-            response["data"] = output
+            response["data"] = self.budget.fit(
+                "fetch_comments", output, ["Content"], listing=True
+            )
+            if delta:
+                # Only what changed since this thread was last read
+                response["first_read"] = changes["first_read"]
+                response["changed"] = self._changed_comments(changes["changed"])
+                response["deleted"] = changes["deleted"]
         except Exception as e:
             response["status"] = "error"
             response["message"] = str(e)
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def submit_comment(self, args):
         response = {"status": "success"}
+        account = self.accounts.primary
 
         try:
             # Validate arguments
@@ -169,20 +671,38 @@ class AutoGPTReddit:
                 self.set_error_response(
                     response, "Missing required arguments (parent_id, content)"
                 )
-                return json.dumps(response)
+                return self._result(response)
 
             parent_id = args["parent_id"]
             content = args["content"]
 
             # Determine parent item
-            parent_item = (
-                self.reddit.comment(id=parent_id)
-                if parent_id.startswith("t1_")
-                else self.reddit.submission(id=parent_id)
-            )
+            parent_item = self._item_from_id(parent_id, self._reader())
+            if self._repeated(
+                response,
+                "previous_replies",
+                self.ledger.replies_to(parent_item.fullname),
+                f"You have already replied to {parent_item.fullname}",
+            ):
+                return self._result(response)
+
+            account, thread = self._writer_for(parent_item, args.get("context"))
+            if self._write_blocked(response, account):
+                return self._result(response)
 
             # Post the comment
+            parent_item = self._item_from_id(parent_item.fullname, account.reddit)
             comment = parent_item.reply(content)
+            self.accounts.record_write(account)
+            self._record_activity(
+                "comment",
+                fullname=comment.fullname,
+                parent=parent_item.fullname,
+                target=parent_item.fullname,
+                content=content,
+                thread=thread,
+                account=account.username,
+            )
 
             response["data"] = {
                 "id": comment.id,
@@ -197,7 +717,7 @@ class AutoGPTReddit:
                 match = re.search(r"Take a break for (\d+) minutes", str(e))
                 if match:
                     minutes = int(match.group(1))
-                    AutoGPTReddit.rate_limit_reset_time = time.time() + (minutes * 60)
+                    self._rate_limited(account, minutes * 60)
                 else:
                     # Log or handle the case where the expected text was not found in the error message
                     print("Unexpected rate limit message format.")
@@ -206,12 +726,14 @@ class AutoGPTReddit:
             self.set_error_response(response, f"Client exception: {str(e)}")
 
         except Exception as e:
+            self.accounts.failed(account)
             self.set_error_response(response, f"Unknown exception: {str(e)}")
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def submit_post(self, args):
         response = {"status": "success"}
+        account = self.accounts.primary
 
         try:
             # Validate arguments
@@ -219,33 +741,53 @@ class AutoGPTReddit:
                 self.set_error_response(
                     response, "Missing required arguments (title, content, subreddit)"
                 )
-                return json.dumps(response)
+                return self._result(response)
 
             title = args["title"]
             content = args["content"]
             subreddit_name = args["subreddit"]
+            flair_id = args.get("flair_id")
+            # Subreddit names are case insensitive
+            target = f"r/{subreddit_name.lower()}"
+
+            if self._repeated(
+                response,
+                "previous_posts",
+                self.ledger.duplicates(target, f"{title}\n{content}"),
+                f"You already submitted this post to r/{subreddit_name}",
+            ):
+                return self._result(response)
+
+            # New posts stick to one account per subreddit
+            thread = target if len(self.accounts) > 1 else None
+            account = self.accounts.writer(thread) if thread else account
+            if self._write_blocked(response, account):
+                return self._result(response)
 
             # Getting subreddit object
-            subreddit = self.reddit.subreddit(subreddit_name)
+            subreddit = account.reddit.subreddit(subreddit_name)
 
-            # Check if the subreddit requires flair
-            if subreddit.link_flair_position != "none":
-                # Fetch available flairs
-                available_flairs = list(subreddit.flair.link_templates)
-                if available_flairs:
-                    flair_options = [
-                        {"id": flair["id"], "text": flair["text"]}
-                        for flair in available_flairs
-                    ]
-                    self.set_error_response(
-                        response,
-                        "This subreddit requires flair. Please pick one and try again.",
-                    )
-                    response["available_flairs"] = flair_options
-                    return json.dumps(response)
+            # Check if the subreddit requires flair (cached, usually no request)
+            flair = self.subreddit_cache.flair(subreddit_name)
+            if flair["required"] and not flair_id and flair["choices"]:
+                self.set_error_response(
+                    response,
+                    "This subreddit requires flair. Please pick one and try again.",
+                )
+                response["available_flairs"] = flair["choices"]
+                return self._result(response)
 
             # Submitting the post to the specified subreddit
-            submission = subreddit.submit(title, selftext=content)
+            submission = subreddit.submit(title, selftext=content, flair_id=flair_id)
+            self.accounts.record_write(account)
+            self._record_activity(
+                "post",
+                fullname=submission.fullname,
+                target=target,
+                content=f"{title}\n{content}",
+                thread=thread,
+                account=account.username,
+            )
 
             response["data"] = {
                 "id": submission.id,
@@ -255,12 +797,16 @@ class AutoGPTReddit:
         except praw.exceptions.APIException as e:
             self.set_error_response(response, f"API exception: {str(e)}")
 
+            # The cached flair requirements may be stale
+            if "FLAIR" in str(e):
+                self.subreddit_cache.invalidate(subreddit_name, "flair")
+
             # Handle rate-limiting
             if "RATELIMIT" in str(e):
                 match = re.search(r"Take a break for (\d+) minutes", str(e))
                 if match:
                     minutes = int(match.group(1))
-                    AutoGPTReddit.rate_limit_reset_time = time.time() + (minutes * 60)
+                    self._rate_limited(account, minutes * 60)
                 else:
                     print("Unexpected rate limit message format.")
 
@@ -268,54 +814,313 @@ class AutoGPTReddit:
             self.set_error_response(response, f"Client exception: {str(e)}")
 
         except Exception as e:
+            self.accounts.failed(account)
             self.set_error_response(response, f"Unknown exception: {str(e)}")
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def vote(self, args):
         response = {"status": "success"}
         try:
             item_id = args["id"]
             action = args["action"]
-            item = (
-                self.reddit.comment(id=item_id)
-                if item_id.startswith("t1_")
-                else self.reddit.submission(id=item_id)
-            )
+            # Votes on an item always come from the account writing in its thread
+            target = self._item_from_id(item_id, self._reader())
+            account, thread = self._writer_for(target, args.get("context"))
+            if self._write_blocked(response, account):
+                return self._result(response)
+            item = self._item_from_id(item_id, account.reddit)
             if action == "upvote":
                 item.upvote()
             elif action == "downvote":
                 item.downvote()
+            self.accounts.record_write(account)
+            self._record_activity(
+                "vote",
+                target=item.fullname,
+                direction=action,
+                thread=thread,
+                account=account.username,
+            )
             response["data"] = {"id": item_id, "action": action}
         except Exception as e:
             response["status"] = "error"
             response["message"] = str(e)
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
+
+    @staticmethod
+    def _flag(value):
+        return value is True or str(value).lower() == "true"
+
+    @staticmethod
+    def _fullname(item_id):
+        # Any kind (t1_ comment, t3_ post, t4_ message...) passes through
+        return item_id if re.match(r"t\d_", item_id) else f"t3_{item_id}"
+
+    @staticmethod
+    def _is_post_or_comment(fullname):
+        return fullname.startswith(("t1_", "t3_"))
+
+    def _info(self, reddit, fullnames):
+        # /api/info answers up to 100 fullnames per request
+        items = {}
+        for start in range(0, len(fullnames), 100):
+            for item in reddit.info(fullnames=fullnames[start : start + 100]):
+                items[item.fullname] = item
+        return items
+
+    def vote_batch(self, args):
+        response = {"status": "success"}
+        try:
+            votes = args.get("votes")
+            if isinstance(votes, str):
+                votes = loads(votes)
+            if not votes and args.get("ids"):
+                ids = args["ids"]
+                ids = ids.split(",") if isinstance(ids, str) else ids
+                votes = [{"id": i.strip(), "action": args.get("action")} for i in ids]
+            if not votes:
+                self.set_error_response(response, "Missing required argument (votes)")
+                return self._result(response)
+
+            results = []
+            wanted = {}
+            for vote in votes:
+                if not isinstance(vote, dict) or not vote.get("id"):
+                    results.append(
+                        {"id": None, "status": "invalid", "message": "Missing id"}
+                    )
+                    continue
+                fullname = self._fullname(vote["id"])
+                if not self._is_post_or_comment(fullname):
+                    results.append(
+                        {
+                            "id": fullname,
+                            "status": "invalid",
+                            "message": "Only posts and comments can be voted on",
+                        }
+                    )
+                elif vote.get("action") not in self.VOTE_LIKES:
+                    results.append({"id": fullname, "status": "invalid action"})
+                else:
+                    wanted[fullname] = vote["action"]
+
+            # One bulk lookup gives each item's thread and our current vote
+            items = self._info(self.reddit, list(wanted))
+            by_account = {}
+            for fullname, action in wanted.items():
+                if fullname not in items:
+                    results.append({"id": fullname, "status": "not found"})
+                    continue
+                account, thread = self._writer_for(items[fullname])
+                by_account.setdefault(account.username, (account, []))[1].append(
+                    (fullname, action, thread)
+                )
+
+            for account, account_votes in by_account.values():
+                if account is not self.accounts.primary:
+                    # ``likes`` is per account, so ask as the voting account
+                    account_items = self._info(
+                        account.reddit, [fullname for fullname, _, _ in account_votes]
+                    )
+                else:
+                    account_items = items
+                for fullname, action, thread in account_votes:
+                    item = account_items.get(fullname)
+                    results.append(
+                        self._cast_vote(account, item, fullname, action, thread)
+                    )
+
+            response["data"] = results
+            response["voted"] = sum(1 for r in results if r["status"] == "voted")
+            response["skipped"] = sum(1 for r in results if r["status"] == "unchanged")
+        except Exception as e:
+            response["status"] = "error"
+            response["message"] = str(e)
+        return self._result(response)
+
+    def _cast_vote(self, account, item, fullname, action, thread):
+        if item is None:
+            return {"id": fullname, "status": "not found"}
+        try:
+            if item.likes is self.VOTE_LIKES[action]:
+                return {"id": fullname, "status": "unchanged"}
+            if not account.can_write():
+                return {"id": fullname, "status": "rate limited"}
+            if action == "upvote":
+                item.upvote()
+            elif action == "downvote":
+                item.downvote()
+            else:
+                item.clear_vote()
+        except Exception as e:
+            return {"id": fullname, "status": "error", "message": str(e)}
+        self.accounts.record_write(account)
+        self._record_activity(
+            "vote",
+            target=fullname,
+            direction=action,
+            thread=thread,
+            account=account.username,
+        )
+        return {"id": fullname, "status": "voted", "action": action}
+
+    def fetch_items(self, args):
+        response = {"status": "success"}
+        try:
+            ids = args.get("ids") or []
+            if isinstance(ids, str):
+                ids = [i.strip() for i in ids.split(",") if i.strip()]
+            if not ids:
+                self.set_error_response(response, "Missing required argument (ids)")
+                return self._result(response)
+            fullnames = list(dict.fromkeys(self._fullname(i) for i in ids))
+            invalid = [f for f in fullnames if not self._is_post_or_comment(f)]
+            fullnames = [f for f in fullnames if self._is_post_or_comment(f)]
+
+            posts, comments = [], []
+            for fullname, item in self._info(self._reader(), fullnames).items():
+                if fullname.startswith("t3_"):
+                    posts.append(submission_record(item))
+                else:
+                    comments.append(comment_record(item))
+            # Everything loaded here is reusable by later commands
+            self.search_index.add_posts(posts)
+            self.search_index.add_comments(comments)
+            for record in posts:
+                self.parent_cache.set(record["fullname"], record["title"])
+            for record in comments:
+                self.parent_cache.set(record["fullname"], record["body"])
+
+            records = {record["fullname"]: record for record in posts + comments}
+            current_time = time.time()
+            output = []
+            for fullname in fullnames:
+                record = records.get(fullname)
+                if record is None:
+                    continue
+                output.append(
+                    {
+                        "id": fullname,
+                        "title": record.get("title"),
+                        "text": record.get("selftext", record.get("body")),
+                        "score": record["score"],
+                        "author": record["author"],
+                        "subreddit": record["subreddit"],
+                        "parent_id": record.get("parent_id"),
+                        "age": AutoGPTReddit.seconds_to_detailed_time(
+                            current_time - record["created_utc"]
+                        ),
+                    }
+                )
+
+            response["data"] = self.budget.fit(
+                "fetch_items", output, ["text"], listing=True
+            )
+            missing = [fullname for fullname in fullnames if fullname not in records]
+            if missing:
+                response["missing"] = missing
+            if invalid:
+                # Only posts (t3_) and comments (t1_) can be fetched
+                response["invalid"] = invalid
+        except Exception as e:
+            response["status"] = "error"
+            response["message"] = str(e)
+        return self._result(response)
+
+    def _warm_parents(self, parent_ids):
+        # One /api/info request resolves the parents of many notifications
+        missing = [p for p in parent_ids if p and p not in self.parent_cache]
+        for fullname, parent in self._info(self.reddit, missing).items():
+            if fullname.startswith("t1_"):
+                self.parent_cache.set(fullname, parent.body)
+            else:
+                self.parent_cache.set(fullname, parent.title)
+
+    def warm_submission(self, post_id, sort="best"):
+        # Loads a post with its first page of comments in that sort
+        submission = self._reader().submission(id=post_id)
+        submission.comment_sort = sort
+        submission.comments.replace_more(limit=0)
+        self.submission_cache.set((post_id, sort), submission)
+
+    def _submission(self, post_id, sort="best"):
+        # A warmed thread is used once, so later reads of it are fresh
+        submission = self.submission_cache.get((post_id, sort))
+        if submission is None:
+            return self._reader().submission(id=post_id)
+        self.submission_cache.delete((post_id, sort))
+        self._consumed(("submission", post_id, sort))
+        return submission
+
+    def warm_notification(self, fullname):
+        # One listing of the unread inbox warms every notification in it
+        if fullname not in self.notification_cache:
+            for item in self.reddit.inbox.unread(limit=None):
+                self.notification_cache.set(item.fullname, item)
+
+    def _unread_notification(self, fullname):
+        item = self.notification_cache.get(fullname)
+        if item is not None:
+            self._consumed(("notification", fullname))
+            return item
+        for item in self.reddit.inbox.unread(limit=None):
+            if item.fullname == fullname:
+                return item
+        return None
+
+    def _consumed(self, key):
+        if self.speculation is not None:
+            self.speculation.consumed(key)
+
+    def refresh_inbox(self, limit=25, ttl=None):
+        records = [
+            message_record(message)
+            for message in self.reddit.inbox.unread(limit=limit)
+        ]
+        if any(self.triage_rules):
+            ignored = set(self._triage_matches(records, *self.triage_rules))
+            if ignored:
+                self._mark_messages(list(ignored), read=True)
+                records = [r for r in records if r["fullname"] not in ignored]
+        self._warm_parents(
+            [r["parent_id"] for r in records if r["fullname"].startswith("t1_")]
+        )
+        if ttl or self.inbox_cache.ttl:
+            self.inbox_cache.set("unread", records, ttl)
+        return records
+
+    def _forget_unread(self, fullnames):
+        records = self.inbox_cache.get("unread")
+        if records is not None:
+            self.inbox_cache.set(
+                "unread", [r for r in records if r["fullname"] not in fullnames]
+            )
 
     def _create_notification_data(self, message):
-        content = message.body[: AutoGPTReddit.TRUNCATION_LIMIT]
-        should_truncate = len(message.body) > AutoGPTReddit.TRUNCATION_LIMIT
-        item_type = "comment" if message.fullname.startswith("t1_") else "message"
+        item_type = "comment" if message["fullname"].startswith("t1_") else "message"
         current_time = time.time()
-        age = current_time - message.created_utc
+        age = current_time - message["created_utc"]
         detailed_age = AutoGPTReddit.seconds_to_detailed_time(age)
 
         # Initialize the response data
         response_data = {
-            "id": message.fullname,
-            "from": message.author.name if message.author else "Unknown",
-            "content": content if not should_truncate else f"{content}...",
+            "id": message["fullname"],
+            "from": message["author"],
+            "content": message["body"],
             "type": item_type,
             "age": detailed_age,  # Added this line
         }
 
-        # If the notification is a comment reply, fetch the parent comment and its ID
+        # If the notification is a comment reply, add the parent and its ID
         if item_type == "comment":
             try:
-                parent_comment = self.reddit.comment(message.parent_id.split("_")[1])
-                parent_comment.refresh()  # To ensure all attributes are populated
-                response_data["parent_comment_id"] = parent_comment.fullname
-                response_data["parent_comment_content"] = parent_comment.body
+                parent_id = message["parent_id"]
+                self._warm_parents([parent_id])
+                response_data["parent_comment_id"] = parent_id
+                response_data["parent_comment_content"] = self.parent_cache.get(
+                    parent_id
+                )
             except Exception as e:
                 response_data[
                     "parent_comment_error"
@@ -327,11 +1132,23 @@ class AutoGPTReddit:
         response = {"status": AutoGPTReddit.SUCCESS}
         try:
             limit = min(args.get("limit", 10), 5)
-            unread_messages = list(self.reddit.inbox.unread(limit=limit))
+            unread_messages = self.inbox_cache.get("unread")
+            if unread_messages is None:
+                unread_messages = self._refresh_once(
+                    f"inbox:{self.accounts.primary.username}",
+                    self.refresh_inbox,
+                    lambda: self.inbox_cache.get("unread"),
+                )
             notification_data = [
-                self._create_notification_data(message) for message in unread_messages
+                self._create_notification_data(message)
+                for message in unread_messages[:limit]
             ]
-            response["data"] = notification_data
+            response["data"] = self.budget.fit(
+                "fetch_notifications",
+                notification_data,
+                ["content", "parent_comment_content"],
+                listing=True,
+            )
         except praw.exceptions.APIException as e:
             self.set_error_response(response, f"API exception: {str(e)}")
         except praw.exceptions.ClientException as e:
@@ -339,53 +1156,105 @@ class AutoGPTReddit:
         except Exception as e:
             self.set_error_response(response, f"Unknown exception: {str(e)}")
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
+
+    @staticmethod
+    def _triage_matches(records, older_than_days, authors):
+        cutoff = time.time() - older_than_days * 86400 if older_than_days else None
+        authors = {a[2:] if a.startswith("u/") else a for a in map(str.lower, authors)}
+        return [
+            record["fullname"]
+            for record in records
+            if (cutoff and record["created_utc"] < cutoff)
+            or record["author"].lower() in authors
+        ]
+
+    def _mark_messages(self, fullnames, read=True):
+        # One request marks a whole batch, as Reddit's inbox does
+        path = API_PATH["read_message" if read else "unread_message"]
+        for start in range(0, len(fullnames), AutoGPTReddit.MARK_BATCH):
+            batch = fullnames[start : start + AutoGPTReddit.MARK_BATCH]
+            self.reddit.post(path, data={"id": ",".join(batch)})
+        if read:
+            self._forget_unread(set(fullnames))
+            for fullname in fullnames:
+                self.notification_cache.delete(fullname)
+        else:
+            # Items turned unread again are listed on the next fetch
+            self.inbox_cache.delete("unread")
+
+    @staticmethod
+    def _id_list(value):
+        if isinstance(value, str):
+            value = value.split(",")
+        return [item.strip() for item in value or [] if item and item.strip()]
 
-    def fetch_user_profile(self, args) -> str:
-        response = {"status": "success"}
-        char_count = 0
+    def triage_inbox(self, args):
+        response = {"status": AutoGPTReddit.SUCCESS}
         try:
-            username = args.get("username")
-            user = self.reddit.redditor(username)
+            mark_read = self._id_list(args.get("mark_read"))
+            mark_unread = self._id_list(args.get("mark_unread"))
+            older_than_days = float(args.get("older_than_days") or 0)
+            authors = self._id_list(args.get("authors"))
+
+            if older_than_days or authors:
+                # Rules are matched against the whole unread inbox
+                unread = [
+                    message_record(message)
+                    for message in self.reddit.inbox.unread(limit=None)
+                ]
+                matched = self._triage_matches(unread, older_than_days, authors)
+                mark_read += [f for f in matched if f not in mark_read]
+            if not (mark_read or mark_unread):
+                self.set_error_response(
+                    response,
+                    "Nothing to triage (mark_read, mark_unread, older_than_days "
+                    "or authors)",
+                )
+                return self._result(response)
 
-            # User basic information
-            user_data = {
-                "id": user.id,
-                "name": user.name,
-                "karma": user.link_karma + user.comment_karma,
+            mark_unread = [f for f in mark_unread if f not in mark_read]
+            if mark_read:
+                self._mark_messages(mark_read, read=True)
+            if mark_unread:
+                self._mark_messages(mark_unread, read=False)
+            response["data"] = {
+                "marked_read": mark_read,
+                "marked_unread": mark_unread,
             }
+            if older_than_days or authors:
+                read = set(mark_read)
+                response["data"]["unread_remaining"] = sum(
+                    1 for record in unread if record["fullname"] not in read
+                )
+        except praw.exceptions.APIException as e:
+            self.set_error_response(response, f"API exception: {str(e)}")
+        except Exception as e:
+            self.set_error_response(response, f"Unknown exception: {str(e)}")
 
-            # Fetch user's posts (submissions)
-            posts = []
-            for post in user.submissions.new(limit=10):  # Change limit as needed
-                post_info = {
-                    "id": post.id,
-                    "title": post.title,
-                    "score": post.score,
-                }
-                posts.append(post_info)
-                char_count += len(json.dumps(post_info))
-                if char_count >= 2500:
-                    break
-
-            comments = []
-            if char_count < 2500:
-                for comment in user.comments.new(limit=10):  # Change limit as needed
-                    comment_info = {
-                        "id": comment.id,
-                        "parent_id": comment.parent_id,  # Fetching parent ID
-                        "post_id": comment.link_id,  # Fetching post ID
-                        "body": comment.body,
-                        "score": comment.score,
-                    }
-                    comments.append(comment_info)
-                    char_count += len(json.dumps(comment_info))
-                    if char_count >= 2500:
-                        break
+        return self._result(response)
+
+    def fetch_user_profile(self, args) -> str:
+        response = {"status": "success"}
+        try:
+            username = args.get("username")
+            # Loads the profile concurrently and reports deltas since last call
+            user_data = self.profiles.fetch(username)
+
+            # Posts come first; comments fill whatever budget is left
+            posts = user_data["posts"]
+            items = self.budget.fit(
+                "fetch_user_profile",
+                posts + user_data["comments"],
+                ["title", "body"],
+                head={
+                    k: v for k, v in user_data.items() if k not in ("posts", "comments")
+                },
+            )
 
             # Combine user info, posts, and comments
-            user_data["posts"] = posts
-            user_data["comments"] = comments
+            user_data["posts"] = items[: len(posts)]
+            user_data["comments"] = items[len(posts) :]
 
             response["data"] = user_data
 
@@ -393,82 +1262,209 @@ class AutoGPTReddit:
             response["status"] = "error"
             response["message"] = str(e)
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
+
+    def fetch_own_activity(self, args) -> str:
+        response = {"status": "success"}
+        try:
+            day = args.get("day") or utc_day(time.time())
+            current_time = time.time()
+            actions = [
+                {
+                    "action": entry["action"],
+                    "id": entry["id"],
+                    "target": entry["target"],
+                    "score": entry.get("score"),
+                    "age": AutoGPTReddit.seconds_to_detailed_time(
+                        int(current_time - entry["timestamp"])
+                    ),
+                }
+                for entry in self.ledger.on_day(day)
+            ]
+            data = {"day": day, "karma": self.ledger.karma, "actions": actions}
+
+            replied_to = args.get("replied_to")
+            if replied_to:
+                fullname = (
+                    replied_to
+                    if re.match(r"t\d_", replied_to)
+                    else f"t3_{replied_to}"
+                )
+                data["replied_to"] = {
+                    "id": fullname,
+                    "replied": self.ledger.has_replied(fullname),
+                    "replies": [e["id"] for e in self.ledger.replies_to(fullname)],
+                }
+
+            if self.ledger.reconcile_due():
+                self._reconcile_ledger()
+            response["data"] = data
+        except Exception as e:
+            response["status"] = "error"
+            response["message"] = str(e)
+        return self._result(response)
+
+    def get_account_pool_status(self, args=None):
+        response = {"status": "success"}
+        try:
+            response["data"] = self.accounts.metrics()
+            # Retries, hedges and reads that shared another caller's request
+            response["data"]["requests"] = {
+                username: requestor.stats()
+                for username, requestor in self.requestors.items()
+            }
+            if self.speculation is not None:
+                response["data"]["speculation"] = self.speculation.stats()
+        except Exception as e:
+            response["status"] = "error"
+            response["message"] = str(e)
+        return self._result(response)
 
     def fetch_subreddit_info(self, args):
         response = {"status": "success"}
         try:
             subreddit_name = args["subreddit"]
-            subreddit = self.reddit.subreddit(subreddit_name)
+            about = self.subreddit_cache.about(subreddit_name)
             response["data"] = {
-                "id": subreddit.id,
-                "name": subreddit.display_name,
-                "subscribers": subreddit.subscribers,
-                "description": subreddit.public_description,
+                "id": about["id"],
+                "name": about["name"],
+                "subscribers": about["subscribers"],
+                "description": about["public_description"],
             }
         except Exception as e:
             response["status"] = "error"
             response["message"] = str(e)
-        return json.dumps(response)
+        return self._result(response)
+
+    def _post_search_result(self, record, current_time, relevance):
+        age = current_time - record["created_utc"]  # Calculate the age of the post
+        result = {
+            "id": record["id"],
+            "title": record["title"],
+            "content": record["selftext"],
+            "score": record["score"],
+            "comments_count": record["num_comments"],
+            "age": AutoGPTReddit.seconds_to_detailed_time(age),
+        }
+        if relevance:
+            result["relevance"] = relevance[record["fullname"]]
+        return result
+
+    def _comment_search_result(self, record, current_time, relevance):
+        age = current_time - record["created_utc"]  # Calculate the age of the comment
+        result = {
+            "id": record["id"],
+            "content": record["body"],
+            "score": record["score"],
+            "parent_id": record["parent_id"],
+            "age": AutoGPTReddit.seconds_to_detailed_time(age),
+        }
+        if relevance:
+            result["relevance"] = relevance[record["fullname"]]
+        return result
+
+    @staticmethod
+    def _merge_search_results(local, remote, limit):
+        # Reciprocal rank fusion: items found by both searches float to the top
+        scores = {}
+        records = {}
+        for results in (local, remote):
+            for rank, record in enumerate(results):
+                scores[record["id"]] = scores.get(record["id"], 0) + 1 / (60 + rank)
+                records[record["id"]] = record  # Prefer the fresher remote copy
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [records[item_id] for item_id in ranked[:limit]]
+
+    def _search(
+        self, args, local_search, remote_search, add_records, to_record, text_of
+    ):
+        # Returns the records found, with a ``goal`` their relevance, and the
+        # cursor to resume a remote search the deadline cut short
+        query = args["query"]
+        goal = args.get("goal")
+        limit = args.get("limit", 10)
+        fetched = self._candidates(limit, goal)
+        scope = args.get("scope", "remote")
+        if scope not in AutoGPTReddit.SEARCH_SCOPES:
+            raise ValueError(
+                f"Unknown scope {scope!r}, expected one of "
+                f"{', '.join(AutoGPTReddit.SEARCH_SCOPES)}"
+            )
+
+        after = args.get("after")
+        local = local_search(query, fetched) if scope != "remote" and not after else []
+        remote, cursor = [], None
+        if scope != "local":
+            params = {"after": after} if after else None
+            remote = gather(
+                to_record(item)
+                for item in remote_search(query, limit=fetched, params=params)
+            )
+            add_records(remote)
+            cursor = remote[-1]["fullname"] if self._partial(remote) else None
+        if scope == "hybrid":
+            records = self._merge_search_results(local, remote, fetched)
+        else:
+            records = local if scope == "local" else remote
+        if goal:
+            return (*self._rank_by_goal(goal, records, text_of, limit), cursor)
+        return records[:limit], {}, cursor
 
     def search_posts(self, args):
         response = {"status": "success"}
         try:
-            query = args["query"]
-            limit = args.get("limit", 10)
-            posts = self.reddit.subreddit("all").search(query, limit=limit)
-            post_data = []
+            records, relevance, cursor = self._search(
+                args,
+                self.search_index.search_posts,
+                self._reader().subreddit("all").search,
+                self.search_index.add_posts,
+                submission_record,
+                post_text,
+            )
             current_time = time.time()
-            for post in posts:
-                age = current_time - post.created_utc  # Calculate the age of the post
-                detailed_age = AutoGPTReddit.seconds_to_detailed_time(
-                    age
-                )  # Format the age
-                post_data.append(
-                    {
-                        "id": post.id,
-                        "title": post.title,
-                        "content": post.selftext,
-                        "score": post.score,
-                        "comments_count": post.num_comments,
-                        "age": detailed_age,
-                    }
-                )
-            response["data"] = post_data
+            results = [
+                self._post_search_result(record, current_time, relevance)
+                for record in records
+            ]
+            response["data"] = self.budget.fit(
+                "search_posts", results, ["content"], listing=True
+            )
+            self._mark_partial(response, cursor)
         except Exception as e:
             response["status"] = "error"
             response["message"] = str(e)
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def search_comments(self, args):
         response = {"status": "success"}
         try:
-            query = args["query"]
-            limit = args.get("limit", 10)
-            comments = self.reddit.subreddit("all").search_comments(query, limit=limit)
-            comment_data = []
-            current_time = time.time()
-            for comment in comments:
-                age = (
-                    current_time - comment.created_utc
-                )  # Calculate the age of the post
-                detailed_age = AutoGPTReddit.seconds_to_detailed_time(
-                    age
-                )  # Format the age
-                comment_data.append(
-                    {
-                        "id": comment.id,
-                        "content": comment.body,
-                        "score": comment.score,
-                        "parent_id": comment.parent_id,
-                        "age": detailed_age,
-                    }
+            # Reddit's API cannot search comments, only the local index can
+            args = {"scope": "local", **args}
+            if args["scope"] in ("remote", "hybrid"):
+                raise ValueError(
+                    'Remote comment search is unsupported, use scope "local"'
                 )
-            response["data"] = comment_data
+            records, relevance, cursor = self._search(
+                args,
+                self.search_index.search_comments,
+                None,
+                self.search_index.add_comments,
+                comment_record,
+                comment_text,
+            )
+            current_time = time.time()
+            results = [
+                self._comment_search_result(record, current_time, relevance)
+                for record in records
+            ]
+            response["data"] = self.budget.fit(
+                "search_comments", results, ["content"], listing=True
+            )
+            self._mark_partial(response, cursor)
         except Exception as e:
             response["status"] = "error"
             response["message"] = str(e)
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def subscribe_subreddit(self, args):
         response = {"status": "success"}
@@ -480,70 +1476,71 @@ class AutoGPTReddit:
         except prawcore.exceptions.RequestException as e:
             response["status"] = "error"
             response["message"] = "An error occurred while subscribing"
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def get_subscribed_subreddits(self, args=None):
         response = {"status": "success"}
         try:
-            subscribed_subreddits = [
-                sub.display_name for sub in self.reddit.user.subreddits()
-            ]
+            subreddits = list(self.reddit.user.subreddits())
+            self.subreddit_cache.warm(subreddits)
+            subscribed_subreddits = [sub.display_name for sub in subreddits]
             response["data"] = {"subscribed_subreddits": subscribed_subreddits}
         except prawcore.exceptions.RequestException as e:
             response["status"] = "error"
             response["message"] = "An error occurred"
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def get_subreddit_info(self, args):
         response = {"status": "success"}
         try:
             subreddit_name = args["subreddit"]
-            subreddit = self.reddit.subreddit(subreddit_name)
-            response["data"] = {
-                "id": subreddit.id,
-                "name": subreddit.display_name,
-                "title": subreddit.title,
-                "description": subreddit.description,
-                "subscribers": subreddit.subscribers,
-                "created_utc": subreddit.created_utc,
-                "public_description": subreddit.public_description,
-                "over18": subreddit.over18,
-                "wiki_enabled": subreddit.wiki_enabled,
-            }
+            data = dict(self.subreddit_cache.about(subreddit_name))
+            data.pop("link_flair_position")
+            data["rules"] = [
+                rule["name"] for rule in self.subreddit_cache.rules(subreddit_name)
+            ]
+            flair = self.subreddit_cache.flair(subreddit_name)
+            data["flair_required"] = flair["required"]
+            data["available_flairs"] = flair["choices"]
+            response["data"] = data
         except Exception as e:
             response["status"] = "error"
             response["message"] = f"An error occurred: {e}"
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def get_popular_subreddits(self, args):
         response = {"status": "success"}
         try:
             limit = int(args.get("limit", 10))
-            subreddit = self.reddit.subreddit("popular")
-            posts = subreddit.hot(limit=limit)
-            subreddits = [post.subreddit.display_name for post in posts]
+            topic = args.get("topic")
+            subreddits = self.discovery.top(limit, topic=topic)
             response["data"] = {"popular_subreddits": subreddits}
         except prawcore.exceptions.RequestException as e:
             response["status"] = "error"
             response["message"] = f"An error occurred: {e}"
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def read_notification(self, args):
         response = {"status": "success"}
         try:
             message_id = args["message_id"]
 
+            # A notification warmed from the inbox needs no request of its own
+            cached = self.notification_cache.get(message_id)
+            if cached is not None:
+                self._consumed(("notification", message_id))
+
             # Determine whether the ID corresponds to a comment or a message
             if message_id.startswith("t1_"):
-                message = self.reddit.comment(id=message_id[3:])
+                message = cached or self.reddit.comment(id=message_id[3:])
                 message_type = "comment"
             elif message_id.startswith("t4_"):
-                message = self.reddit.inbox.message(message_id[3:])
+                message = cached or self.reddit.inbox.message(message_id[3:])
                 message_type = "message"
             else:
                 response["status"] = "error"
                 response["message"] = "Unknown message type"
-                return json.dumps(response)
+                return self._result(response)
 
             response["data"] = {
                 "id": message.id,
@@ -554,18 +1551,18 @@ class AutoGPTReddit:
         except Exception as e:
             response["status"] = "error"
             response["message"] = f"An error occurred: {e}"
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def fetch_and_describe_image_post(self, args):
         response = {"status": "success"}
         try:
             post_id = args.get("post_id")
-            post = self.reddit.submission(id=post_id)
+            post = self._reader().submission(id=post_id)
 
             if not post.url.lower().endswith((".png", ".jpg", ".jpeg")):
                 response["status"] = "error"
                 response["message"] = "Not an image post."
-                return json.dumps(response, ensure_ascii=False)
+                return self._result(response)
 
             # SceneXplain API request
             YOUR_GENERATED_SECRET = os.environ.get("SCENEX_API_KEY")
@@ -581,10 +1578,12 @@ class AutoGPTReddit:
                 "content-type": "application/json",
             }
 
-            connection = http.client.HTTPSConnection("api.scenex.jina.ai")
-            connection.request("POST", "/v1/describe", json.dumps(data), headers)
+            connection = http.client.HTTPSConnection(
+                "api.scenex.jina.ai", timeout=deadline.timeout(SCENEX_TIMEOUT)
+            )
+            connection.request("POST", "/v1/describe", dumps(data), headers)
             api_response = connection.getresponse()
-            api_data = json.loads(api_response.read().decode("utf-8"))
+            api_data = loads(api_response.read().decode("utf-8"))
 
             # Extract description
             description = api_data.get("result", [{}])[0].get(
@@ -602,17 +1601,16 @@ class AutoGPTReddit:
             response["status"] = "error"
             response["message"] = str(e)
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def fetch_comment_tree(self, args) -> str:
         response = {"status": "success"}
-        char_count = 0  # Initialize character count for truncation
         try:
             comment_id = args.get("comment_id")
             limit = args.get("limit", 10)  # Limit for child comments
 
             # Initialize comment
-            comment = self.reddit.comment(id=comment_id)
+            comment = self._reader().comment(id=comment_id)
 
             # Fetch the comment details
             comment_info = {
@@ -621,14 +1619,15 @@ class AutoGPTReddit:
                 "score": comment.score,
                 "parent_id": comment.parent_id,
             }
-            char_count += len(json.dumps(comment_info))
 
             # Fetch replies (child comments)
             comment.replies.replace_more(limit=0)  # Replace 'more' comments
+            self.search_index.add_comments([comment_record(comment)])
             replies = []
             for reply in comment.replies.list()[:limit]:
                 if isinstance(reply, MoreComments):
                     continue
+                self.search_index.add_comments([comment_record(reply)])
                 reply_info = {
                     "id": reply.id,
                     "body": reply.body,
@@ -636,12 +1635,11 @@ class AutoGPTReddit:
                     "parent_id": reply.parent_id,
                 }
                 replies.append(reply_info)
-                char_count += len(json.dumps(reply_info))
-                if char_count >= 2500:
-                    break
 
             # Combine comment info and replies
-            comment_info["replies"] = replies
+            comment_info["replies"] = self.budget.fit(
+                "fetch_comment_tree", replies, ["body"], comment_info, ["body"]
+            )
 
             response["data"] = comment_info
 
@@ -649,7 +1647,7 @@ class AutoGPTReddit:
             response["status"] = "error"
             response["message"] = str(e)
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
 
     def get_comment_info(self, comment_id: str) -> dict:
         comment = self.reddit.comment(id=comment_id)
@@ -678,26 +1676,29 @@ class AutoGPTReddit:
                     response,
                     "Missing required arguments (notification_id, reply_content)",
                 )
-                return json.dumps(response)
+                return self._result(response)
 
-            # Fetch the unread messages from the inbox
-            unread_messages = list(self.reddit.inbox.unread(limit=None))
+            if self._repeated(
+                response,
+                "previous_replies",
+                self.ledger.replies_to(notification_id),
+                f"You have already replied to {notification_id}",
+            ):
+                return self._result(response)
 
-            # Find the notification message by its ID
-            notification_message = None
-            for message in unread_messages:
-                if message.fullname == notification_id:
-                    notification_message = message
-                    break
+            # Find the notification among the unread messages of the inbox
+            notification_message = self._unread_notification(notification_id)
 
             if not notification_message:
                 self.set_error_response(
                     response, f"No unread notification found with ID {notification_id}"
                 )
-                return json.dumps(response)
+                return self._result(response)
 
             # Mark the notification as read
             notification_message.mark_read()
+            self._forget_unread({notification_id})
+            self.notification_cache.delete(notification_id)
 
             # Check if the notification is a comment or a message
             if notification_message.fullname.startswith("t1_"):  # It's a comment
@@ -707,6 +1708,13 @@ class AutoGPTReddit:
 
             # Reply to the comment or message
             comment = parent_item.reply(reply_content)
+            self._record_activity(
+                "reply",
+                fullname=comment.fullname,
+                parent=notification_id,
+                target=notification_id,
+                content=reply_content,
+            )
             response[
                 "message"
             ] = "Successfully replied and marked the notification as read."
@@ -721,19 +1729,53 @@ class AutoGPTReddit:
         except Exception as e:
             self.set_error_response(response, f"Unknown exception: {str(e)}")
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
+
+    def _changed_comments(self, changed):
+        rows = []
+        for change in changed:
+            row = {
+                "id": change["record"]["id"],
+                "score": change["record"]["score"],
+                "score_delta": change["score_delta"],
+            }
+            if change["edited"]:
+                row["content"] = change["record"]["body"]
+            rows.append(row)
+        return self.budget.fit("delta_changes", rows, ["content"])
+
+    def _post_delta(self, post_id, changes):
+        new_comments = [
+            {
+                "id": record["id"],
+                "content": record["body"],
+                "score": record["score"],
+                "author": record["author"],
+            }
+            for record in changes["new"]
+        ]
+        return {
+            "id": post_id,
+            "changes": changes["post"],
+            "new_comments": self.budget.fit(
+                "fetch_post_details", new_comments, ["content"]
+            ),
+            "changed_comments": self._changed_comments(changes["changed"]),
+            "deleted_comments": changes["deleted"],
+        }
 
     def fetch_post_details(self, args) -> str:
         response = {"status": AutoGPTReddit.SUCCESS}
-        char_count = 0
         try:
             post_id = args.get("post_id")
             if not post_id:
                 self.set_error_response(response, "Missing post_id")
-                return json.dumps(response)
+                return self._result(response)
+            delta = self._flag(args.get("delta"))
+            summarize = self._flag(args.get("summarize"))
 
             # Fetch the Reddit post using its ID
-            post = self.reddit.submission(id=post_id)
+            post = self._submission(post_id)
 
             # Calculate the age of the post
             current_time = time.time()
@@ -750,27 +1792,43 @@ class AutoGPTReddit:
                 "comments_count": post.num_comments,
                 "upvote_ratio": post.upvote_ratio,
             }
-            char_count += len(json.dumps(post_details))
+            self.search_index.add_posts([submission_record(post)])
 
             # Fetch the top 3 comments
             top_comments = []
             post.comment_sort = "best"
             post.comments.replace_more(limit=0)
-            for comment in post.comments[:3]:
+            comments = post.comments.list() if summarize else post.comments[:3]
+            records = [comment_record(comment) for comment in comments]
+            self.search_index.add_comments(records)
+            if delta:
+                changes = self.threads.diff(post.id, submission_record(post), records)
+                if not changes["first_read"]:
+                    response["data"] = self._post_delta(post.id, changes)
+                    return self._result(response)
+            if summarize:
+                # The summary gets two thirds of the budget, the post the rest
+                budget = self.budget.budget_for("fetch_post_details")
+                post_details.update(self.summarizer.summarize(records, budget * 2 // 3))
+                self.budget.fit("fetch_post_details", [], [], post_details, ["content"])
+                response["data"] = post_details
+                return self._result(response)
+            for comment in comments:
                 comment_details = {
                     "id": comment.id,
-                    "content": comment.body[:50] + "..."
-                    if len(comment.body) > 50
-                    else comment.body,
+                    "content": comment.body,
                     "score": comment.score,
                     "author": str(comment.author),
                 }
                 top_comments.append(comment_details)
-                char_count += len(json.dumps(comment_details))
-                if char_count >= 2500:
-                    break
 
-            post_details["top_comments"] = top_comments
+            post_details["top_comments"] = self.budget.fit(
+                "fetch_post_details",
+                top_comments,
+                ["content"],
+                post_details,
+                ["content"],
+            )
             response["data"] = post_details
 
         except praw.exceptions.APIException as e:
@@ -780,4 +1838,4 @@ class AutoGPTReddit:
         except Exception as e:
             self.set_error_response(response, f"Unknown exception: {str(e)}")
 
-        return json.dumps(response, ensure_ascii=False)
+        return self._result(response)
@@ -1,6 +1,4 @@
 """Reddit API integrations using PRAW."""
-import json
-import logging
 import os
 import random
 import re
@@ -9,9 +7,13 @@ from typing import Any, Dict, List, Optional, Tuple, TypedDict, TypeVar
 
 import praw
 from auto_gpt_plugin_template import AutoGPTPluginTemplate
-from autogpt.logs.helpers import print_attribute
 
 from .AutoGPTReddit import AutoGPTReddit
+from .prefetch import PrefetchWorker
+from .serialization import dumps, payload_of
+from .settings import env_bool, env_float, env_int, env_list
+from .speculation import SpeculativePrefetcher, default_rules
+from .stream import SubredditStreamer
 
 PromptGenerator = TypeVar("PromptGenerator")
 
@@ -49,6 +51,10 @@ class RedditPlugin(AutoGPTPluginTemplate):
         self.post_id = []
         self.posts = []
         self.api = None
+        # Serve Auto-GPT's text embeddings with the local hashing embedder
+        self.text_embedding = env_bool("REDDIT_TEXT_EMBEDDING")
+        # Seconds pre_command waits for the context of a command's items
+        self.enrich_timeout = env_float("REDDIT_ENRICH_TIMEOUT", 0.5)
         can_generate_posts = (
             os.environ.get("CAN_GENERATE_POSTS", "false").lower() == "true"
         )
@@ -75,6 +81,47 @@ class RedditPlugin(AutoGPTPluginTemplate):
             print("Reddit credentials not found in .env file.")
             self.api = None
 
+        self.prefetcher = None
+        if self.api and env_bool("REDDIT_PREFETCH"):
+            # Keep the inbox and subscribed listings warm in the background
+            self.prefetcher = PrefetchWorker(
+                self.api,
+                interval=env_int("REDDIT_PREFETCH_INTERVAL", 60),
+                subreddits=env_list("REDDIT_PREFETCH_SUBREDDITS"),
+                max_subreddits=env_int("REDDIT_PREFETCH_MAX_SUBREDDITS", 10),
+                reserve=env_int("REDDIT_PREFETCH_RESERVE", 100),
+            )
+            self.prefetcher.start()
+            print("Reddit prefetch worker started.")
+
+        if self.api and env_bool("REDDIT_SPECULATE"):
+            # Warm the threads and notifications the agent will likely open next
+            reserve = env_int("REDDIT_PREFETCH_RESERVE", 100)
+            self.api.speculation = SpeculativePrefetcher(
+                default_rules(self.api, top=env_int("REDDIT_SPECULATE_TOP", 3)),
+                # Threads are read by the next reader, the inbox by the primary
+                lambda: self.api.within_budget(reserve)
+                and self.api.within_budget(reserve, self.api.accounts.primary),
+                ttl=env_int("REDDIT_SPECULATE_TTL", 120),
+                min_hit_rate=env_float("REDDIT_SPECULATE_MIN_HIT_RATE", 0.2),
+            )
+
+        watched_subreddits = env_list("REDDIT_WATCH_SUBREDDITS")
+        if self.api and watched_subreddits:
+            # Stream new posts and comments of closely watched subreddits
+            self.api.streamer = SubredditStreamer(
+                self.api.reddit,
+                watched_subreddits,
+                interval=env_int("REDDIT_STREAM_INTERVAL", 15),
+                buffer_size=env_int("REDDIT_STREAM_BUFFER", 1000),
+                search_index=self.api.search_index,
+                reserve=env_int("REDDIT_PREFETCH_RESERVE", 100),
+                shared_state=self.api.shared,
+                account=self.api.accounts.primary.username.lower(),
+            )
+            self.api.streamer.start()
+            print(f"Watching subreddits: {', '.join(watched_subreddits)}")
+
         if can_generate_posts:
             print(
                 "Warning: CAN_GENERATE_POSTS is set to true. submit_post command is enabled."
@@ -204,47 +251,13 @@ class RedditPlugin(AutoGPTPluginTemplate):
         Returns:
             Tuple[str, Dict[str, Any]]: The command name and the arguments.
         """
-        logger = logging.getLogger("USER_FRIENDLY_OUTPUT_LOGGER")
-        # Initialize the Reddit instance from AutoGPTReddit.py
         if self.api:
-            reddit_instance = AutoGPTReddit(
-                self.client_id,
-                self.client_secret,
-                self.user_agent,
-                self.username,
-                self.password,
-            )
-
-        # Check for Reddit post IDs in arguments and fetch information
-        post_ids = arguments.get("post_ids", [])
-        post_info = {}
-        for post_id in post_ids:
-            post_info[post_id] = reddit_instance.get_post_info(post_id)
-
-        # Check for Reddit comment IDs in arguments and fetch information
-        comment_ids = arguments.get("comment_ids", [])
-        comment_info = {}
-        for comment_id in comment_ids:
-            comment_info[comment_id] = reddit_instance.get_comment_info(comment_id)
-
-        # Combine the fetched information based on specified fields
-        fetched_info = {}
-
-        if post_info:
-            fetched_info["posts"] = {
-                post_id: {"title": info["title"], "text": info["text"]}
-                for post_id, info in post_info.items()
-            }
-
-        if comment_info:
-            fetched_info["comments"] = {
-                comment_id: {"parent_comments": info["parent_comments"]}
-                for comment_id, info in comment_info.items()
-            }
-
-        # Append this fetched info to the arguments or handle as needed
-
-        logger.info(fetched_info)
+            if self.api.speculation:
+                self.api.speculation.before(command_name)
+            # Commands declaring the items they write to get them resolved
+            arguments = self.api.enrich(
+                command_name, arguments, self.enrich_timeout
+            )
         return command_name, arguments
 
     def can_handle_post_command(self) -> bool:
@@ -270,18 +283,17 @@ class RedditPlugin(AutoGPTPluginTemplate):
         ):
             AutoGPTReddit.rate_limit_reset_time = None
 
-        if response:
-            try:
-                # Assuming 'response' should be a dictionary.
-                response_dict = json.loads(response)
-                return json.dumps([rate_limited_message, response_dict])
-            except json.JSONDecodeError:
-                # Handle JSON decode error
-                return json.dumps(
-                    [rate_limited_message, {"error": "Invalid JSON response"}]
-                )
-        else:
-            return json.dumps([rate_limited_message, {"error": "Empty response"}])
+        if not response:
+            return dumps([rate_limited_message, {"error": "Empty response"}])
+        try:
+            # Commands return a CommandResult, which is never parsed again
+            response_dict = payload_of(response)
+        except ValueError:
+            return dumps([rate_limited_message, {"error": "Invalid JSON response"}])
+        if self.api and self.api.speculation:
+            self.api.speculation.observe(command_name, response_dict)
+        # The command already wrote its response in REDDIT_OUTPUT_FORMAT
+        return f"[{dumps(rate_limited_message)},{response}]"
 
     def can_handle_chat_completion(
         self,
@@ -329,13 +341,8 @@ class RedditPlugin(AutoGPTPluginTemplate):
         """
 
         if self.api:
-            reddit_instance = AutoGPTReddit(
-                self.client_id,
-                self.client_secret,
-                self.user_agent,
-                self.username,
-                self.password,
-            )
+            # Share one client so local caches and the search index persist
+            reddit_instance = self.api
 
             prompt.add_command(
                 "fetch_posts",
@@ -345,6 +352,8 @@ class RedditPlugin(AutoGPTPluginTemplate):
                     "sort_by": {"description": 'Sorting criteria ("hot", "new", "top"; default is "hot")', "type": "string"},
                     "limit": {"description": "Number of posts to fetch (default is 20)", "type": "integer"},
                     "time_filter": {"description": 'Time filter for trending posts ("day", "week", "month", "year", "all"; default is "day")', "type": "string"},
+                    "goal": {"description": "What you are looking for; returns the most relevant posts first", "type": "string"},
+                    "after": {"description": "cursor of a partial response, to continue where it stopped", "type": "string"},
                 }),
                 lambda **kwargs: reddit_instance.fetch_posts(kwargs)
             )
@@ -355,6 +364,8 @@ class RedditPlugin(AutoGPTPluginTemplate):
                 "Fetch detailed information of a Reddit post along with its top 3 comments.",
                 extract_types({
                     "post_id": {"type": "string"},
+                    "delta": {"description": "true to return only what changed since you last read this post", "type": "boolean"},
+                    "summarize": {"description": "true to add an extractive summary of the whole comment thread instead of the top comments", "type": "boolean"},
                 }),
                 lambda **kwargs: reddit_instance.fetch_post_details(kwargs)
             )
@@ -367,6 +378,8 @@ class RedditPlugin(AutoGPTPluginTemplate):
                     "post_id": {"type": "string"},
                     "limit": {"type": "integer"},
                     "sort_by": {"type": "string"},
+                    "delta": {"description": "true to return only new, changed and deleted comments since your last read", "type": "boolean"},
+                    "summarize": {"description": "true to return an extractive summary and key comment IDs instead of the comments", "type": "boolean"},
                 }),
                 lambda **kwargs: reddit_instance.fetch_comments(kwargs)
             )
@@ -404,6 +417,28 @@ class RedditPlugin(AutoGPTPluginTemplate):
                 lambda **kwargs: reddit_instance.vote(kwargs)
             )
             
+            # vote_batch command
+            prompt.add_command(
+                "vote_batch",
+                "Vote on many posts and comments at once. Items already voted that way are skipped.",
+                extract_types({
+                    "votes": {"description": 'List of {"id": ..., "action": "upvote", "downvote" or "clear"}', "type": "array"},
+                    "ids": {"description": "Comma separated IDs, all voted with action (instead of votes)", "type": "string"},
+                    "action": {"type": "string"},
+                }),
+                lambda **kwargs: reddit_instance.vote_batch(kwargs)
+            )
+            
+            # fetch_items command
+            prompt.add_command(
+                "fetch_items",
+                "Fetch many posts and comments by ID in one call. Faster than fetching them one by one.",
+                extract_types({
+                    "ids": {"description": "Comma separated post (t3_) and comment (t1_) IDs", "type": "string"},
+                }),
+                lambda **kwargs: reddit_instance.fetch_items(kwargs)
+            )
+            
             # fetch_notifications command
             prompt.add_command(
                 "fetch_notifications",
@@ -414,6 +449,19 @@ class RedditPlugin(AutoGPTPluginTemplate):
                 lambda **kwargs: reddit_instance.fetch_notifications(kwargs)
             )
             
+            # triage_inbox command
+            prompt.add_command(
+                "triage_inbox",
+                "Mark many notifications read or unread at once, by ID or by rule, so ignored ones stop showing up.",
+                extract_types({
+                    "mark_read": {"description": "Notification IDs to mark read", "type": "array"},
+                    "mark_unread": {"description": "Notification IDs to mark unread", "type": "array"},
+                    "older_than_days": {"description": "Mark read every unread notification older than this many days", "type": "integer"},
+                    "authors": {"description": "Mark read every unread notification from these usernames", "type": "array"},
+                }),
+                lambda **kwargs: reddit_instance.triage_inbox(kwargs)
+            )
+            
             # respond_to_notification command
             prompt.add_command(
                 "respond_to_notification",
@@ -446,7 +494,7 @@ class RedditPlugin(AutoGPTPluginTemplate):
             # get_subreddit_info command
             prompt.add_command(
                 "get_subreddit_info",
-                "Fetch information about a specific subreddit",
+                "Fetch information about a specific subreddit, including its rules and whether posts need flair",
                 extract_types({
                     "subreddit": {"type": "string"},
                 }),
@@ -456,8 +504,11 @@ class RedditPlugin(AutoGPTPluginTemplate):
             # get_popular_subreddits command
             prompt.add_command(
                 "get_popular_subreddits",
-                "Fetch a list of popular subreddits",
-                extract_types({}),
+                "Fetch a ranked list of popular subreddits with subscriber counts, optionally about a topic",
+                extract_types({
+                    "limit": {"type": "integer"},
+                    "topic": {"description": "Keywords the subreddits should be about (optional)", "type": "string"},
+                }),
                 lambda **kwargs: reddit_instance.get_popular_subreddits(kwargs)
             )
             
@@ -481,13 +532,50 @@ class RedditPlugin(AutoGPTPluginTemplate):
                 lambda **kwargs: reddit_instance.fetch_user_profile(kwargs)
             )
             
+            if reddit_instance.streamer:
+                # fetch_new_since command
+                prompt.add_command(
+                    "fetch_new_since",
+                    "Fetch posts or comments of a watched subreddit that you have not seen yet. Uses no API calls.",
+                    extract_types({
+                        "subreddit": {"type": "string"},
+                        "kind": {"description": '"posts" or "comments" (default is "posts")', "type": "string"},
+                        "limit": {"type": "integer"},
+                    }),
+                    lambda **kwargs: reddit_instance.fetch_new_since(kwargs)
+                )
+            
+            # get_account_pool_status command, a diagnostic kept out of the
+            # agent's command list unless asked for
+            if env_bool("REDDIT_DEBUG_COMMANDS"):
+                prompt.add_command(
+                    "get_account_pool_status",
+                    "Show the request quota left, write availability and request statistics of your Reddit accounts.",
+                    extract_types({}),
+                    lambda **kwargs: reddit_instance.get_account_pool_status(kwargs)
+                )
+            
+            # fetch_own_activity command
+            prompt.add_command(
+                "fetch_own_activity",
+                "List your own posts, comments, replies and votes of a day and check whether you already replied to an item. Uses no API calls.",
+                extract_types({
+                    "day": {"description": "UTC day as YYYY-MM-DD (default is today)", "type": "string"},
+                    "replied_to": {"description": "Post, comment or notification ID to check for an existing reply (optional)", "type": "string"},
+                }),
+                lambda **kwargs: reddit_instance.fetch_own_activity(kwargs)
+            )
+            
             # search_posts command
             prompt.add_command(
                 "search_posts",
-                "Search for posts based on a query",
+                "Search for posts based on a query. Use scope \"local\" to instantly search posts you already fetched.",
                 extract_types({
                     "query": {"type": "string"},
                     "limit": {"type": "integer"},
+                    "scope": {"description": 'Where to search ("local", "remote", "hybrid"; default is "remote")', "type": "string"},
+                    "goal": {"description": "What you are looking for; returns the most relevant results first", "type": "string"},
+                    "after": {"description": "cursor of a partial response, to continue where it stopped", "type": "string"},
                 }),
                 lambda **kwargs: reddit_instance.search_posts(kwargs)
             )
@@ -495,10 +583,11 @@ class RedditPlugin(AutoGPTPluginTemplate):
             # search_comments command
             prompt.add_command(
                 "search_comments",
-                "Search for comments based on a query",
+                "Search the comments you already fetched based on a query. Reddit cannot search comments remotely.",
                 extract_types({
                     "query": {"type": "string"},
                     "limit": {"type": "integer"},
+                    "goal": {"description": "What you are looking for; returns the most relevant results first", "type": "string"},
                 }),
                 lambda **kwargs: reddit_instance.search_comments(kwargs)
             )
@@ -519,7 +608,7 @@ class RedditPlugin(AutoGPTPluginTemplate):
             )
             prompt.add_best_practice(
                 {
-                    "Occasionally use fetch-notifications to check your notifications and reply to them. Reply only once to each notification. If you are unsure check your profile first.",
+                    "Occasionally use fetch-notifications to check your notifications and reply to them. Reply only once to each notification. If you are unsure check fetch_own_activity first.",
                 }
             )
             prompt.add_best_practice(
@@ -575,7 +664,8 @@ class RedditPlugin(AutoGPTPluginTemplate):
                 extract_types({
                     "title": {"type": "string"},
                     "content": {"type": "string"},
-                    "subreddit": {"type": "string"}
+                    "subreddit": {"type": "string"},
+                    "flair_id": {"description": "Flair id from get_subreddit_info (optional)", "type": "string"},
                 }),
                 lambda **kwargs: reddit_instance.submit_post(kwargs),
             )
@@ -595,10 +685,10 @@ class RedditPlugin(AutoGPTPluginTemplate):
         return prompt
 
     def can_handle_text_embedding(self, text: str) -> bool:
-        return False
+        return self.text_embedding and self.api is not None
 
     def handle_text_embedding(self, text: str) -> list:
-        pass
+        return self.api.embedder.embed([text])[0].tolist()
 
     def can_handle_user_input(self, user_input: str) -> bool:
         return False
@@ -0,0 +1,192 @@
+"""Pool of Reddit accounts sharing the plugin's read and write load."""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WRITE_POLICIES = ("sticky", "primary")
+UNHEALTHY_AFTER = 3  # Consecutive failures before an account is rested
+REST_SECONDS = 300
+
+
+class Account:
+    """One account's client together with its rate-limit and health state."""
+
+    def __init__(self, username: str, reddit):
+        self.username = username
+        self.reddit = reddit
+        self.rate_limited_until = 0.0
+        self.failures = 0
+        self.resting_until = 0.0
+        self.reads = 0
+        self.writes = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.time() >= self.resting_until
+
+    def can_write(self) -> bool:
+        return self.healthy and time.time() >= self.rate_limited_until
+
+    def remaining(self) -> Optional[float]:
+        # Requests left in the current window; None until the first response
+        return self.reddit.auth.limits.get("remaining")
+
+    def metrics(self) -> Dict:
+        limits = self.reddit.auth.limits
+        now = time.time()
+        return {
+            "username": self.username,
+            "healthy": self.healthy,
+            "remaining": limits.get("remaining"),
+            "reset_in": max(0, round((limits.get("reset_timestamp") or now) - now)),
+            "write_blocked_for": max(0, round(self.rate_limited_until - now)),
+            "reads": self.reads,
+            "writes": self.writes,
+        }
+
+
+class AccountPool:
+    """Load-balances reads across accounts and assigns writes by policy.
+
+    Reads go to the healthy account with the most requests left in its
+    rate-limit window. With the ``sticky`` write policy every thread (or
+    subreddit, for new posts) is written to by exactly one account: the
+    first account to act in it keeps it, even while rate limited, so a thread
+    never sees several of the pool's accounts commenting or voting. The
+    ``primary`` policy writes with the first account only.
+    """
+
+    def __init__(
+        self, accounts: List[Account], write_policy: str = "sticky", shared_state=None
+    ):
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f"Unknown write policy {write_policy}")
+        self.accounts = accounts
+        self.write_policy = write_policy
+        # Thread assignments and rate-limit blocks of other processes
+        self.shared_state = shared_state
+        self._by_name = {account.username.lower(): account for account in accounts}
+        self._assignments: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(
+        cls,
+        primary: Account,
+        path: Optional[str],
+        create_client: Callable[..., object],
+        write_policy: str = "sticky",
+        shared_state=None,
+    ) -> "AccountPool":
+        # The file holds a JSON list of objects with the praw.Reddit keyword
+        # arguments client_id, client_secret, username, password, user_agent.
+        accounts = [primary]
+        if path:
+            with open(path, encoding="utf-8") as accounts_file:
+                for credentials in json.load(accounts_file):
+                    if credentials["username"].lower() == primary.username.lower():
+                        continue
+                    accounts.append(
+                        Account(credentials["username"], create_client(**credentials))
+                    )
+        return cls(accounts, write_policy, shared_state)
+
+    @property
+    def primary(self) -> Account:
+        return self.accounts[0]
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def next_reader(self) -> Account:
+        """The account ``reader`` would pick, without counting a read."""
+        healthy = [account for account in self.accounts if account.healthy]
+        candidates = healthy or self.accounts
+        # Accounts that have not made a request yet have a full window
+        return max(
+            candidates,
+            key=lambda a: (
+                float("inf") if a.remaining() is None else a.remaining(),
+                -a.reads,
+            ),
+        )
+
+    def reader(self) -> Account:
+        account = self.next_reader()
+        account.reads += 1
+        return account
+
+    def writer(self, thread: str) -> Account:
+        """The account that writes in ``thread``; assigned on first use."""
+        self.sync()
+        if self.write_policy == "primary" or len(self.accounts) == 1:
+            return self.primary
+        with self._lock:
+            username = self._assignments.get(thread)
+            if username in self._by_name:
+                return self._by_name[username]
+            available = [a for a in self.accounts if a.can_write()] or self.accounts
+            username = min(available, key=lambda a: a.writes).username.lower()
+            if self.shared_state is not None:
+                # Another process may have given the thread to an account first
+                username = self.shared_state.assign_thread(thread, username)
+            self._assignments[thread] = username
+            return self._by_name.get(username, self.primary)
+
+    def assign(self, thread: str, username: str) -> None:
+        # Restores assignments recorded before a restart
+        with self._lock:
+            if username.lower() in self._by_name:
+                self._assignments.setdefault(thread, username.lower())
+
+    def record_write(self, account: Account) -> None:
+        account.writes += 1
+        account.failures = 0
+
+    def rate_limited(self, account: Account, seconds: float) -> None:
+        account.rate_limited_until = time.time() + seconds
+        if self.shared_state is not None:
+            self.shared_state.block_writes(
+                account.username.lower(), account.rate_limited_until
+            )
+
+    def sync(self) -> None:
+        if self.shared_state is None:
+            return
+        for account in self.accounts:
+            account.rate_limited_until = max(
+                account.rate_limited_until,
+                self.shared_state.writes_blocked_until(account.username.lower()),
+            )
+
+    def failed(self, account: Account) -> None:
+        account.failures += 1
+        if account.failures >= UNHEALTHY_AFTER:
+            logger.warning("Resting Reddit account u/%s", account.username)
+            account.resting_until = time.time() + REST_SECONDS
+            account.failures = 0
+
+    def write_available_at(self) -> Optional[float]:
+        """None if some account can write now, else when the first one can."""
+        self.sync()
+        if any(account.can_write() for account in self.accounts):
+            return None
+        return min(
+            max(account.rate_limited_until, account.resting_until)
+            for account in self.accounts
+        )
+
+    def metrics(self) -> Dict:
+        accounts = [account.metrics() for account in self.accounts]
+        return {
+            "write_policy": self.write_policy,
+            "accounts": accounts,
+            "healthy": sum(1 for a in accounts if a["healthy"]),
+            "can_write": sum(1 for a in self.accounts if a.can_write()),
+            "remaining": sum(a["remaining"] or 0 for a in accounts),
+            "threads_assigned": len(self._assignments),
+        }
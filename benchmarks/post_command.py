@@ -0,0 +1,66 @@
+"""Compares the old parse-and-wrap post_command path with CommandResult.
+
+Run from the repository root: ``python benchmarks/post_command.py``. The
+payload mimics a fetch_posts listing of ``--rows`` posts.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+from serialization import CommandResult, dumps, payload_of  # noqa: E402
+
+MESSAGE = "You are not currently rate limited"
+
+
+def listing(rows: int) -> dict:
+    return {
+        "status": "success",
+        "data": [
+            {
+                "id": f"abc{i}",
+                "title": f"Post number {i} about something — with ünïcode",
+                "text": "Lorem ipsum dolor sit amet. " * 20,
+                "score": i * 7,
+                "comments_count": i,
+                "age": "3 hours",
+            }
+            for i in range(rows)
+        ],
+    }
+
+
+def old_path(response: dict) -> str:
+    # What commands and post_command used to do
+    text = json.dumps(response, ensure_ascii=False)
+    return json.dumps([MESSAGE, json.loads(text)])
+
+
+def new_path(response: dict) -> str:
+    text = CommandResult(response)
+    payload_of(text)
+    return f"[{dumps(MESSAGE)},{text}]"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    response = listing(args.rows)
+    assert json.loads(old_path(response)) == json.loads(new_path(response))
+    old = timeit.timeit(lambda: old_path(response), number=args.number)
+    new = timeit.timeit(lambda: new_path(response), number=args.number)
+    print(f"backend: {serialization.BACKEND}, rows: {args.rows}")
+    print(f"old path: {old / args.number * 1e6:9.1f} us per command")
+    print(f"new path: {new / args.number * 1e6:9.1f} us per command")
+    print(f"speedup:  {old / new:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Replays a recorded cassette through the plugin, without touching Reddit.
+
+Record a session by running the plugin with ``REDDIT_RECORD=session.jsonl.gz``,
+then from the repository root:
+
+    python benchmarks/replay.py session.jsonl.gz --timing original
+
+Every recorded command runs again against the recorded responses. The runner
+reports each command's request count and latency next to the recording, and
+how much faster or slower the replay was. It exits with status 1 if any
+output or request count differs, or if ``--max-slowdown`` is given and the
+replay took more than that many times the recorded time in total.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The plugin's __init__ imports Auto-GPT, so load the modules under a bare
+# package that skips it
+package = types.ModuleType("autogpt_reddit")
+package.__path__ = [ROOT]
+sys.modules["autogpt_reddit"] = package
+
+from autogpt_reddit.AutoGPTReddit import AutoGPTReddit  # noqa: E402
+from autogpt_reddit.cassette import ReplayRequestor, ReplaySource, load  # noqa: E402
+
+# Relative ages ("3 hours") depend on when a command runs
+VOLATILE_KEYS = frozenset({"age"})
+
+
+def normalized(output: str):
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    try:
+        return strip(json.loads(output))
+    except ValueError:
+        return output
+
+
+def change(recorded: float, replayed: float) -> str:
+    if not recorded:
+        return "-"
+    return f"{(replayed - recorded) / recorded:+.0%}"
+
+
+def replay(path: str, timing: str, max_slowdown: Optional[float] = None) -> int:
+    session, exchanges, commands = load(path)
+    source = ReplaySource(exchanges, timing=timing)
+
+    class ReplayedReddit(AutoGPTReddit):
+        requestor_class = ReplayRequestor
+        requestor_options = {"replay": source}
+
+    # A fresh data directory, so no ledger or cache of a live run leaks in
+    os.environ["REDDIT_DATA_DIR"] = tempfile.mkdtemp(prefix="reddit-replay-")
+    for name in ("REDDIT_RECORD", "REDDIT_SHARED_STATE", "REDDIT_ACCOUNTS_FILE"):
+        os.environ.pop(name, None)
+    reddit = ReplayedReddit(
+        "replay",
+        "replay",
+        session.get("user_agent") or "replay",
+        session.get("username") or "replay",
+        "replay",
+    )
+
+    mismatches = 0
+    recorded_total = replayed_total = 0.0
+    print(
+        f"{'command':32} {'requests':>13} {'recorded ms':>12} {'replay ms':>10}"
+        f" {'change':>7}"
+    )
+    for command in commands:
+        served = source.served
+        start = time.monotonic()
+        output = getattr(reddit, command["name"])(command["args"])
+        elapsed = time.monotonic() - start
+        requests = source.served - served
+        same = normalized(str(output)) == normalized(command["output"])
+        same_requests = requests == command["requests"]
+        mismatches += not (same and same_requests)
+        recorded_total += command["elapsed"]
+        replayed_total += elapsed
+        print(
+            f"{command['name']:32} {requests:>6}/{command['requests']:<6}"
+            f" {command['elapsed'] * 1000:12.1f} {elapsed * 1000:10.1f}"
+            f" {change(command['elapsed'], elapsed):>7}"
+            f"{'' if same else '  output differs'}"
+        )
+    reddit.executor.shutdown(wait=False)
+
+    print(
+        f"{'total':46} {recorded_total * 1000:12.1f} {replayed_total * 1000:10.1f}"
+        f" {change(recorded_total, replayed_total):>7}"
+    )
+    slow = bool(max_slowdown and replayed_total > recorded_total * max_slowdown)
+    if slow:
+        print(f"Replay took more than {max_slowdown}x the recorded time")
+    print(f"\n{len(commands)} commands, {source.served} requests served")
+    if source.unmatched:
+        print(f"{len(source.unmatched)} requests missing from the cassette:")
+        for method, url, _ in source.unmatched[:10]:
+            print(f"  {method} {url}")
+    print(f"{mismatches} mismatched commands")
+    return 1 if mismatches or source.unmatched or slow else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassette")
+    parser.add_argument(
+        "--timing",
+        choices=("none", "original"),
+        default="none",
+        help="Answer at once, or as slowly as the recorded requests",
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        help="Fail when the replay takes more than this many times as long",
+    )
+    args = parser.parse_args()
+    sys.exit(replay(args.cassette, args.timing, args.max_slowdown))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Token budgets for command output."""
+import logging
+import os
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .encoding import uniform_keys
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 700  # Roughly the old 2500 character cap
+MIN_FIELD_TOKENS = 12  # Truncated text fields keep at least this much
+ELLIPSIS = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    # English averages about four characters per token for GPT tokenizers
+    return max(1, (len(text) + 3) // 4)
+
+
+def load_tokenizer(spec: Optional[str]) -> Callable[[str], int]:
+    """Returns a token counter for ``spec``, e.g. ``"tiktoken:cl100k_base"``."""
+    if spec and spec.startswith("tiktoken:"):
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(spec.split(":", 1)[1])
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except ImportError:
+            logger.warning("tiktoken is not installed, estimating token counts.")
+    return estimate_tokens
+
+
+class TokenBudget:
+    """Measures output in tokens and fits rows into a per-command budget.
+
+    ``fit`` first shortens the longest text fields, levelling them down
+    towards the next longest field, and only drops trailing rows once every
+    text field is down to ``min_field_tokens``. Token counts are cached per
+    string, so re-measuring unchanged rows is cheap.
+
+    With a compact ``output_format`` (see encoding.py) the rows of a listing
+    are measured as they are sent, with the field names only once.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Callable[[str], int] = estimate_tokens,
+        default_budget: int = DEFAULT_BUDGET,
+        budgets: Optional[Dict[str, int]] = None,
+        min_field_tokens: int = MIN_FIELD_TOKENS,
+        output_format: str = "json",
+    ):
+        self.count = lru_cache(maxsize=8192)(tokenizer)
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+        self.min_field_tokens = min_field_tokens
+        self.output_format = output_format
+
+    @classmethod
+    def from_env(cls, output_format: str = "json") -> "TokenBudget":
+        # REDDIT_TOKEN_BUDGET sets the default, REDDIT_TOKEN_BUDGET_<COMMAND>
+        # overrides it for one command, e.g. REDDIT_TOKEN_BUDGET_FETCH_POSTS.
+        prefix = "REDDIT_TOKEN_BUDGET_"
+        budgets = {
+            name[len(prefix) :].lower(): int(value)
+            for name, value in os.environ.items()
+            if name.startswith(prefix) and value
+        }
+        return cls(
+            tokenizer=load_tokenizer(os.getenv("REDDIT_TOKENIZER")),
+            default_budget=int(os.getenv("REDDIT_TOKEN_BUDGET") or DEFAULT_BUDGET),
+            budgets=budgets,
+            output_format=output_format,
+        )
+
+    def budget_for(self, command: str) -> int:
+        return self.budgets.get(command, self.default_budget)
+
+    def cost(self, value) -> int:
+        if isinstance(value, dict):
+            return 1 + sum(
+                self.count(str(key)) + self.cost(item) + 1
+                for key, item in value.items()
+            )
+        if isinstance(value, (list, tuple)):
+            return 1 + sum(self.cost(item) + 1 for item in value)
+        return self.count(str(value))
+
+    def fit(
+        self,
+        command: str,
+        rows: Sequence[Dict],
+        fields: Sequence[str],
+        head: Optional[Dict] = None,
+        head_fields: Sequence[str] = (),
+        listing: bool = False,
+    ) -> List[Dict]:
+        """Fits ``head`` plus as many ``rows`` as possible into the budget.
+
+        ``fields`` (of every row) and ``head_fields`` (of ``head``) are the
+        text fields that may be truncated. ``head`` is changed in place and
+        never dropped; the returned rows are copies. ``listing`` rows are the
+        ``data`` of the response and leave in the output format.
+        """
+        rows = [dict(row) for row in rows]
+        budget = self.budget_for(command)
+        slots = [(head, field) for field in head_fields if head.get(field)]
+        slots += [(row, field) for row in rows for field in fields if row.get(field)]
+        keys = uniform_keys(rows) if listing and self.output_format != "json" else None
+
+        def row_cost(row):
+            # A compact row is its values; the field names are the header
+            return self.cost(row if keys is None else list(row.values()))
+
+        total = 1 + sum(row_cost(row) + 1 for row in rows) + self.cost(head or {})
+        if keys is not None:
+            total += self.cost(keys)
+
+        while total > budget:
+            slots.sort(key=lambda slot: self.count(slot[0][slot[1]]), reverse=True)
+            longest = self.count(slots[0][0][slots[0][1]]) if slots else 0
+            if longest > self.min_field_tokens:
+                runner_up = self.count(slots[1][0][slots[1][1]]) if slots[1:] else 0
+                target = max(
+                    self.min_field_tokens, runner_up, longest - (total - budget)
+                )
+                saved = self._truncate(slots[0], min(target, longest - 1))
+                if saved <= 0:
+                    slots.pop(0)  # The tokenizer cannot shorten this any further
+                total -= saved
+            elif rows:
+                dropped = rows.pop()
+                slots = [slot for slot in slots if slot[0] is not dropped]
+                total -= row_cost(dropped) + 1
+            else:
+                break
+        return rows
+
+    def _truncate(self, slot, target_tokens: int) -> int:
+        record, field = slot
+        text = record[field]
+        before = self.count(text)
+        keep = max(1, len(text) * target_tokens // before - len(ELLIPSIS))
+        record[field] = text[:keep].rstrip() + ELLIPSIS
+        return before - self.count(record[field])
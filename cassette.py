@@ -0,0 +1,242 @@
+"""Recording of live Reddit sessions into cassettes, and replaying them.
+
+A cassette is a gzip compressed JSON lines file. The first line describes
+the session, then every HTTP exchange (``"type": "http"``) and every command
+call (``"type": "command"``) follows in the order it happened. Each command
+is written as its own gzip member, so a session that ends without closing
+the file loses at most the command it was running. Credentials
+never reach the file: request headers are not kept, secrets in form data
+and query parameters are replaced and access tokens are redacted.
+"""
+import atexit
+import functools
+import gzip
+import json
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .transport import ResilientRequestor
+
+VERSION = 1
+REDACTED = "REDACTED"
+SECRET_FIELDS = frozenset(
+    {"password", "client_secret", "access_token", "refresh_token", "code", "otp"}
+)
+# Response headers that matter to prawcore (rate limits, retries, paging)
+KEPT_HEADERS = (
+    "content-type",
+    "retry-after",
+    "x-ratelimit-remaining",
+    "x-ratelimit-reset",
+    "x-ratelimit-used",
+)
+
+
+def _redacted(values) -> Dict:
+    if not values:
+        return {}
+    if not isinstance(values, dict):
+        values = dict(values)
+    return {
+        str(k): REDACTED if str(k) in SECRET_FIELDS else str(v)
+        for k, v in values.items()
+    }
+
+
+def _redacted_body(text: str) -> str:
+    # Token responses are the only JSON bodies carrying secrets
+    if "access_token" not in text:
+        return text
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(body, dict):
+        body.update({k: REDACTED for k in SECRET_FIELDS if k in body})
+        return json.dumps(body)
+    return text
+
+
+def request_key(method: str, url: str, params) -> Tuple:
+    params = tuple(sorted(_redacted(params).items()))
+    return method.upper(), url.split("?", 1)[0], params
+
+
+class CassetteRecorder:
+    """Appends the HTTP exchanges and command calls of a session to a cassette.
+
+    Pass it to ``ResilientRequestor`` as ``recorder`` and wrap the commands
+    with ``wrap``. Background workers share the clients, so disable them
+    while recording to keep each command's request count exact.
+    """
+
+    def __init__(self, path: str, **session):
+        self.path = path
+        self.requests = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._file = open(path, "wb")
+        self._write({"type": "session", "version": VERSION, **session})
+        self.flush()
+        # Nothing calls close when Auto-GPT exits
+        atexit.register(self.close)
+
+    def http(self, method: str, url: str, kwargs: Dict, response, elapsed: float):
+        self._write(
+            {
+                "type": "http",
+                "at": round(time.monotonic() - self._started, 4),
+                "method": method.upper(),
+                "url": url,
+                "params": _redacted(kwargs.get("params")),
+                "data": _redacted(kwargs.get("data")),
+                "status": response.status_code,
+                "headers": {
+                    k: response.headers[k]
+                    for k in KEPT_HEADERS
+                    if k in response.headers
+                },
+                "body": _redacted_body(response.text),
+                "elapsed": round(elapsed, 4),
+            },
+            count=True,
+        )
+
+    def wrap(self, target, names: Iterable[str]) -> None:
+        for name in names:
+            method = getattr(target, name, None)
+            if callable(method):
+                setattr(target, name, self._wrapped(name, method))
+
+    def _wrapped(self, name: str, method):
+        @functools.wraps(method)
+        def recorded(args=None):
+            requests_before = self.requests
+            start = time.monotonic()
+            output = method(args)
+            self._write(
+                {
+                    "type": "command",
+                    "name": name,
+                    "args": args,
+                    "output": str(output),
+                    "elapsed": round(time.monotonic() - start, 4),
+                    "requests": self.requests - requests_before,
+                }
+            )
+            self.flush()
+            return output
+
+        return recorded
+
+    def flush(self) -> None:
+        """Writes the records so far to the file as one complete gzip member."""
+        with self._lock:
+            if not self._pending or self._file.closed:
+                return
+            lines, self._pending = self._pending, []
+            self._file.write(gzip.compress("".join(lines).encode("utf-8")))
+            self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entry: Dict, count: bool = False) -> None:
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            if count:
+                self.requests += 1
+            self._pending.append(line + "\n")
+
+
+def _lines(path: str) -> List[str]:
+    lines = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            for line in cassette:
+                lines.append(line)
+    except (EOFError, OSError, zlib.error):
+        # The recording stopped in the middle of its last gzip member
+        if lines and not lines[-1].endswith("\n"):
+            lines.pop()
+    return lines
+
+
+def load(path: str) -> Tuple[Dict, List[Dict], List[Dict]]:
+    """Returns the session header, the HTTP exchanges and the command calls.
+
+    A cassette cut short by a crash loads up to its last complete record.
+    """
+    session, exchanges, commands = {}, [], []
+    for line in _lines(path):
+        entry = json.loads(line)
+        if entry["type"] == "session":
+            session = entry
+        elif entry["type"] == "http":
+            exchanges.append(entry)
+        else:
+            commands.append(entry)
+    return session, exchanges, commands
+
+
+class ReplaySource:
+    """Serves recorded responses to the requests that match them.
+
+    Requests match on method, URL and query parameters; repeated requests
+    get the recorded responses in their original order. ``timing`` is
+    ``"original"`` to wait as long as the recorded request took, or
+    ``"none"`` to answer at once.
+    """
+
+    def __init__(self, exchanges: List[Dict], timing: str = "none"):
+        self.timing = timing
+        self.served = 0
+        self.unmatched: List[Tuple] = []
+        self._queues = defaultdict(deque)
+        for exchange in exchanges:
+            key = request_key(exchange["method"], exchange["url"], exchange["params"])
+            self._queues[key].append(exchange)
+        self._lock = threading.Lock()
+
+    def serve(self, method: str, url: str, kwargs: Dict) -> requests.Response:
+        key = request_key(method, url, kwargs.get("params"))
+        with self._lock:
+            queue = self._queues.get(key)
+            exchange = queue.popleft() if queue else None
+            if exchange is None:
+                self.unmatched.append(key)
+            else:
+                self.served += 1
+        if exchange is None:
+            # Reddit's answer to a request it does not know
+            exchange = {"status": 404, "headers": {}, "body": "{}", "elapsed": 0}
+        if self.timing == "original":
+            time.sleep(exchange["elapsed"])
+
+        response = requests.Response()
+        response.status_code = exchange["status"]
+        response.headers = CaseInsensitiveDict(exchange["headers"])
+        response._content = exchange["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+
+class ReplayRequestor(ResilientRequestor):
+    """``ResilientRequestor`` answering from a ``ReplaySource`` instead of HTTP."""
+
+    def __init__(self, *args, replay: Optional[ReplaySource] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replay = replay
+
+    def _transmit(self, *args, **kwargs):
+        return self.replay.serve(args[0], args[1], kwargs)
@@ -0,0 +1,130 @@
+"""Per-command deadlines, carried to every request a command makes.
+
+The deadline lives in a context variable, so it follows the command through
+PRAW into ``ResilientRequestor`` without being passed around. Work handed to
+an executor only sees it when submitted with ``submit`` below.
+"""
+import contextvars
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Sequence
+
+import prawcore
+
+_deadline = contextvars.ContextVar("reddit_deadline", default=None)
+
+DEFAULT_SECONDS = 60
+
+
+class DeadlineExceeded(prawcore.exceptions.PrawcoreException):
+    """Raised instead of making a request after the command's deadline."""
+
+    def __init__(self):
+        super().__init__("The command ran out of time")
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check() -> None:
+    if expired():
+        raise DeadlineExceeded()
+
+
+def timeout(default: Optional[float]) -> Optional[float]:
+    """``default`` capped to the time left; raises if none is left."""
+    check()
+    left = remaining()
+    if left is None:
+        return default
+    return left if default is None else min(default, left)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    # A nested deadline can only shorten the one already running
+    if not seconds:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """``executor.submit`` that carries the caller's deadline into ``fn``."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class Gathered(list):
+    """Items of an iteration cut short by the deadline when ``partial``."""
+
+    partial = False
+
+
+def gather(items: Iterable) -> Gathered:
+    """Drains ``items`` until they run out or the deadline passes."""
+    gathered = Gathered()
+    try:
+        for item in items:
+            gathered.append(item)
+    except DeadlineExceeded:
+        gathered.partial = True
+    return gathered
+
+
+class Deadlines:
+    """Seconds each command may run; ``wrap`` enforces them on an object."""
+
+    def __init__(
+        self,
+        default: Optional[float] = DEFAULT_SECONDS,
+        deadlines: Optional[Dict[str, float]] = None,
+    ):
+        self.default = default
+        self.deadlines = deadlines or {}
+
+    @classmethod
+    def from_env(cls) -> "Deadlines":
+        # REDDIT_DEADLINE sets the default, REDDIT_DEADLINE_<COMMAND> overrides
+        # it for one command; 0 means no deadline.
+        prefix = "REDDIT_DEADLINE_"
+        deadlines = {
+            name[len(prefix) :].lower(): float(value)
+            for name, value in os.environ.items()
+            if name.startswith(prefix) and value
+        }
+        default = os.getenv("REDDIT_DEADLINE")
+        return cls(float(default) if default else DEFAULT_SECONDS, deadlines)
+
+    def seconds_for(self, command: str) -> Optional[float]:
+        return self.deadlines.get(command, self.default)
+
+    def wrap(self, target, names: Sequence[str]) -> None:
+        for name in names:
+            method = getattr(target, name, None)
+            if callable(method):
+                setattr(target, name, self._wrapped(self.seconds_for(name), method))
+
+    @staticmethod
+    def _wrapped(seconds, method):
+        @functools.wraps(method)
+        def bounded(*args, **kwargs):
+            with deadline(seconds):
+                return method(*args, **kwargs)
+
+        return bounded
@@ -0,0 +1,125 @@
+"""Ranked, deduplicated discovery of popular subreddits."""
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+DECAY = 0.5  # Weight kept by older r/popular sightings on every refresh
+SAMPLE_TITLES = 5  # Post titles remembered per community for topic matching
+
+
+class SubredditDiscovery:
+    """Aggregates r/popular and the /subreddits/popular listing into a ranking.
+
+    The ranking is kept between calls and refreshed incrementally: the r/popular
+    sample is re-read every ``ttl`` seconds and only posts that were not seen
+    before add to a community's heat, which decays on every refresh. The much
+    more stable /subreddits/popular listing is only re-read every
+    ``listing_ttl`` seconds. While both are fresh, ``top`` makes no requests.
+    """
+
+    def __init__(
+        self,
+        reddit,
+        subreddit_cache=None,
+        ttl: float = 1800,
+        listing_ttl: float = 6 * 60 * 60,
+        sample_size: int = 100,
+    ):
+        self.reddit = reddit
+        self.subreddit_cache = subreddit_cache
+        self.ttl = ttl
+        self.listing_ttl = listing_ttl
+        self.sample_size = sample_size
+        self._communities: Dict[str, Dict] = {}
+        self._seen_posts = deque(maxlen=sample_size * 10)
+        self._posts_refreshed_at = 0.0
+        self._listing_refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def top(self, limit: int = 10, topic: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            self._refresh_if_stale()
+            communities = list(self._communities.values())
+        if topic:
+            terms = set(re.findall(r"\w+", topic.lower()))
+            communities = [c for c in communities if terms & self._terms(c)]
+        communities.sort(key=self._score, reverse=True)
+        return [
+            {
+                "name": c["name"],
+                "subscribers": c["subscribers"],
+                "description": c["description"],
+            }
+            for c in communities[:limit]
+        ]
+
+    def _refresh_if_stale(self) -> None:
+        now = time.time()
+        if now - self._listing_refreshed_at >= self.listing_ttl:
+            self._refresh_listing()
+            self._listing_refreshed_at = now
+        if now - self._posts_refreshed_at >= self.ttl:
+            self._refresh_posts()
+            self._posts_refreshed_at = now
+
+    def _refresh_listing(self) -> None:
+        subreddits = list(self.reddit.subreddits.popular(limit=self.sample_size))
+        if self.subreddit_cache is not None:
+            self.subreddit_cache.warm(subreddits)
+        for community in self._communities.values():
+            community["listing_rank"] = 0.0
+        for position, subreddit in enumerate(subreddits):
+            community = self._community(subreddit.display_name)
+            community["subscribers"] = subreddit.subscribers
+            community["description"] = (subreddit.public_description or "")[:100]
+            community["listing_rank"] = 1 - position / len(subreddits)
+            community["about"] = f"{subreddit.title} {subreddit.public_description}"
+
+    def _refresh_posts(self) -> None:
+        for key, community in list(self._communities.items()):
+            community["heat"] *= DECAY
+            # Forget communities that dropped out of both sources
+            if community["heat"] < 0.01 and not community["listing_rank"]:
+                del self._communities[key]
+        seen = set(self._seen_posts)
+        for post in self.reddit.subreddit("popular").hot(limit=self.sample_size):
+            if post.id in seen:
+                continue
+            self._seen_posts.append(post.id)
+            # subreddit and subreddit_subscribers come with the listing data, so
+            # no lazy subreddit fetch is made here
+            community = self._community(post.subreddit.display_name)
+            community["heat"] += 1
+            community["subscribers"] = post.subreddit_subscribers
+            community["titles"].append(post.title)
+
+    def _community(self, name: str) -> Dict:
+        key = name.lower()
+        if key not in self._communities:
+            self._communities[key] = {
+                "name": name,
+                "subscribers": None,
+                "description": "",
+                "heat": 0.0,
+                "listing_rank": 0.0,
+                "about": "",
+                "titles": deque(maxlen=SAMPLE_TITLES),
+            }
+        return self._communities[key]
+
+    @staticmethod
+    def _terms(community: Dict) -> set:
+        text = " ".join([community["name"], community["about"], *community["titles"]])
+        return set(re.findall(r"\w+", text.lower()))
+
+    @staticmethod
+    def _score(community: Dict) -> float:
+        # Current r/popular presence dominates; size and listing position break ties
+        return (
+            community["heat"]
+            + community["listing_rank"]
+            + math.log10((community["subscribers"] or 0) + 1) / 10
+        )
@@ -0,0 +1,93 @@
+"""Local hashed embeddings for ranking fetched items by relevance to a goal."""
+import re
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .cache import TTLCache
+
+DIMENSIONS = 1024
+BATCH = 512  # Texts embedded per NumPy batch
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def post_text(record: Dict) -> str:
+    return f"{record['title']}\n{record['selftext']}"
+
+
+def comment_text(record: Dict) -> str:
+    return record["body"]
+
+
+class HashingEmbedder:
+    """Embeds text by hashing its words and word pairs into a fixed-size vector.
+
+    There is no vocabulary to fit, so any two vectors are comparable. A
+    feature's bucket and sign come from its CRC32, which unlike ``hash`` is
+    the same in every process. Counts are dampened with ``log1p`` and vectors
+    have unit length, so dot products are cosine similarities. Vectors of
+    records are cached by fullname.
+    """
+
+    def __init__(
+        self, dimensions: int = DIMENSIONS, ttl: float = 3600, maxsize: int = 5000
+    ):
+        self.dimensions = dimensions
+        self._vectors = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def embed(self, texts: Sequence[str]):
+        if numpy is None:
+            raise RuntimeError("Relevance ranking needs numpy (pip install numpy)")
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            words = TOKEN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            hashes.extend(zlib.crc32(feature.encode()) for feature in features)
+            rows.extend([row] * len(features))
+        hashes = numpy.array(hashes, dtype=numpy.int64)
+        cells = numpy.array(rows, dtype=numpy.int64) * self.dimensions
+        cells += hashes % self.dimensions
+        signs = numpy.where(hashes >> 31, -1.0, 1.0)
+        vectors = numpy.bincount(
+            cells, weights=signs, minlength=len(texts) * self.dimensions
+        ).reshape(len(texts), self.dimensions)
+        vectors = numpy.sign(vectors) * numpy.log1p(numpy.abs(vectors))
+        norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / numpy.where(norms == 0, 1, norms)
+
+    def embed_records(self, records: Sequence[Dict], text_of: Callable[[Dict], str]):
+        vectors = [self._vectors.get(record["fullname"]) for record in records]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), BATCH):
+            batch = missing[start : start + BATCH]
+            embedded = self.embed([text_of(records[i]) for i in batch])
+            for i, vector in zip(batch, embedded):
+                self._vectors.set(records[i]["fullname"], vector)
+                vectors[i] = vector
+        if not vectors:
+            return numpy.zeros((0, self.dimensions))
+        return numpy.vstack(vectors)
+
+    def rank(
+        self,
+        goal: str,
+        records: Sequence[Dict],
+        text_of: Callable[[Dict], str],
+        min_similarity: Optional[float] = None,
+    ) -> List[Tuple[Dict, float]]:
+        """Orders ``records`` by similarity to ``goal``, most similar first.
+
+        Records less similar than ``min_similarity`` are left out.
+        """
+        if not records:
+            return []
+        similarity = self.embed_records(records, text_of) @ self.embed([goal])[0]
+        return [
+            (records[i], float(similarity[i]))
+            for i in numpy.argsort(-similarity, kind="stable")
+            if min_similarity is None or similarity[i] >= min_similarity
+        ]
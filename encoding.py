@@ -0,0 +1,111 @@
+"""Compact encodings for listing output, so field names are not repeated per row."""
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+FORMATS = ("json", "columns", "tsv")
+
+
+def uniform_keys(rows) -> Optional[List[str]]:
+    # Only lists of dicts sharing one key order can be encoded without loss
+    if not rows or not isinstance(rows, list):
+        return None
+    if not all(isinstance(row, dict) for row in rows):
+        return None
+    keys = list(rows[0])
+    if any(list(row) != keys for row in rows[1:]):
+        return None
+    return keys
+
+
+def to_columns(rows: List[Dict]) -> Any:
+    """``[{"a": 1, "b": 2}]`` becomes ``{"fields": ["a", "b"], "rows": [[1, 2]]}``."""
+    keys = uniform_keys(rows)
+    if keys is None:
+        return rows
+    return {"fields": keys, "rows": [[row[key] for key in keys] for row in rows]}
+
+
+def from_columns(table: Any) -> Any:
+    """Inverse of ``to_columns``."""
+    if not isinstance(table, dict) or set(table) != {"fields", "rows"}:
+        return table
+    return [dict(zip(table["fields"], values)) for values in table["rows"]]
+
+
+def _json_cell(cell: str) -> bool:
+    try:
+        json.loads(cell)
+    except ValueError:
+        return False
+    return True
+
+
+def _tsv_cell(value) -> str:
+    if not isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    cell = value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+    # Text that would read back as another value ("", "123", "null") is quoted
+    if not cell or _json_cell(cell):
+        return json.dumps(value, ensure_ascii=False)
+    return cell
+
+
+_ESCAPE = re.compile(r"\\(.)")
+_UNESCAPED = {"t": "\t", "n": "\n"}
+
+
+def _tsv_value(cell: str) -> Any:
+    try:
+        return json.loads(cell)
+    except ValueError:
+        return _ESCAPE.sub(lambda m: _UNESCAPED.get(m.group(1), m.group(1)), cell)
+
+
+def to_tsv(rows: List[Dict]) -> Any:
+    """A header line of field names followed by one tab separated line per row.
+
+    Tabs, newlines and backslashes inside text are escaped and other values
+    are written as JSON. Text is written as is unless it would read back as
+    JSON, in which case it is quoted, so ``from_tsv`` restores every value
+    with its type.
+    """
+    keys = uniform_keys(rows)
+    if keys is None:
+        return rows
+    lines = ["\t".join(keys)]
+    lines += ["\t".join(_tsv_cell(row[key]) for key in keys) for row in rows]
+    return "\n".join(lines)
+
+
+def from_tsv(table: Any) -> Any:
+    """Inverse of ``to_tsv``."""
+    if not isinstance(table, str):
+        return table
+    lines = table.split("\n")
+    keys = lines[0].split("\t")
+    return [
+        dict(zip(keys, map(_tsv_value, line.split("\t")))) for line in lines[1:]
+    ]
+
+
+def compact_response(response: Dict, output_format: str) -> Dict:
+    """Re-encodes the ``data`` list of a command response in ``output_format``."""
+    if output_format == "json" or not isinstance(response, dict):
+        return response
+    encode = to_tsv if output_format == "tsv" else to_columns
+    data = response.get("data")
+    encoded = encode(data)
+    if encoded is data:
+        return response
+    return {**response, "data": encoded, "format": output_format}
+
+
+def expand_response(response: Dict) -> Dict:
+    """Inverse of ``compact_response``."""
+    if not isinstance(response, dict) or "format" not in response:
+        return response
+    decode = from_tsv if response["format"] == "tsv" else from_columns
+    expanded = {k: v for k, v in response.items() if k != "format"}
+    expanded["data"] = decode(response["data"])
+    return expanded
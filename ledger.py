@@ -0,0 +1,172 @@
+"""Append-only ledger of the actions this account has taken on Reddit."""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(content: Optional[str]) -> Optional[str]:
+    if content is None:
+        return None
+    return hashlib.sha256(content.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def utc_day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class ActivityLedger:
+    """Records every comment, post, vote and reply made by this account.
+
+    Entries are appended to a JSON lines file and indexed in memory by parent,
+    by target and by UTC day, so "have I already replied to X" and "what did
+    I do today" never need an API call. ``parent`` is the item a comment or
+    reply answers, ``target`` the item (or ``r/<name>`` in lower case for
+    posts) acted on. Score snapshots from ``reconcile`` are appended as
+    separate lines. A line left incomplete by a crash is skipped on load.
+    """
+
+    def __init__(self, path: Optional[str] = None, reconcile_interval: float = 3600):
+        self.path = path
+        self.reconcile_interval = reconcile_interval
+        self.karma = None
+        self.reconciled_at = 0.0
+        self._by_id: Dict[str, Dict] = {}
+        self._by_parent = defaultdict(list)
+        self._by_target = defaultdict(list)
+        self._by_day = defaultdict(list)
+        self._threads: Dict[str, str] = {}
+        # The file ends in an incomplete line the next entry must not extend
+        self._torn = False
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def record(
+        self,
+        action: str,
+        fullname: Optional[str] = None,
+        parent: Optional[str] = None,
+        target: Optional[str] = None,
+        content: Optional[str] = None,
+        **extra,
+    ) -> Dict:
+        entry = {
+            "action": action,
+            "id": fullname,
+            "parent": parent,
+            "target": target,
+            "timestamp": time.time(),
+            "content_hash": content_hash(content),
+            **extra,
+        }
+        with self._lock:
+            self._index(entry)
+            self._append(entry)
+        return entry
+
+    def has_replied(self, parent: str) -> bool:
+        return bool(self._by_parent.get(parent))
+
+    def replies_to(self, parent: str) -> List[Dict]:
+        return list(self._by_parent.get(parent, ()))
+
+    def on_day(self, day: Optional[str] = None) -> List[Dict]:
+        return list(self._by_day.get(day or utc_day(time.time()), ()))
+
+    def threads(self) -> Dict[str, str]:
+        # Thread -> pooled account that writes in it, see AccountPool
+        return dict(self._threads)
+
+    def duplicates(self, target: str, content: str) -> List[Dict]:
+        digest = content_hash(content)
+        entries = self._by_target.get(target, ())
+        return [entry for entry in entries if entry["content_hash"] == digest]
+
+    def reconcile_due(self) -> bool:
+        return time.time() - self.reconciled_at >= self.reconcile_interval
+
+    def reconcile(self, reddit, max_age: float = 7 * 86400) -> None:
+        # One request for the karma plus one /api/info request per 100 items
+        # created in the last ``max_age`` seconds; older scores rarely move.
+        self.reconciled_at = time.time()
+        with self._lock:
+            fullnames = [
+                fullname
+                for fullname, entry in self._by_id.items()
+                if fullname.startswith(("t1_", "t3_"))
+                and self.reconciled_at - entry["timestamp"] < max_age
+            ]
+        scores = {}
+        for start in range(0, len(fullnames), 100):
+            for item in reddit.info(fullnames=fullnames[start : start + 100]):
+                scores[item.fullname] = item.score
+        me = reddit.user.me()
+        snapshot = {
+            "action": "snapshot",
+            "timestamp": self.reconciled_at,
+            "karma": me.link_karma + me.comment_karma,
+            "scores": scores,
+        }
+        with self._lock:
+            self._apply_snapshot(snapshot)
+            self._append(snapshot)
+
+    def _index(self, entry: Dict) -> None:
+        if entry["action"] == "snapshot":
+            self._apply_snapshot(entry)
+            return
+        if entry["id"]:
+            self._by_id[entry["id"]] = entry
+        if entry["parent"]:
+            self._by_parent[entry["parent"]].append(entry)
+        if entry["target"]:
+            target = entry["target"]
+            # Older ledgers kept the subreddit name as it was typed
+            if target.startswith("r/"):
+                target = target.lower()
+            self._by_target[target].append(entry)
+        self._by_day[utc_day(entry["timestamp"])].append(entry)
+        if entry.get("thread") and entry.get("account"):
+            self._threads.setdefault(entry["thread"], entry["account"])
+
+    def _apply_snapshot(self, snapshot: Dict) -> None:
+        self.karma = snapshot["karma"]
+        self.reconciled_at = max(self.reconciled_at, snapshot["timestamp"])
+        for fullname, score in snapshot["scores"].items():
+            if fullname in self._by_id:
+                self._by_id[fullname]["score"] = score
+
+    def _append(self, entry: Dict) -> None:
+        if not self.path:
+            return
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        if self._torn:
+            line = "\n" + line
+            self._torn = False
+        with open(self.path, "a", encoding="utf-8") as ledger_file:
+            ledger_file.write(line)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as ledger_file:
+                for number, line in enumerate(ledger_file, 1):
+                    self._torn = not line.endswith("\n")
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(
+                            "Skipping unreadable line %d of %s", number, self.path
+                        )
+                        continue
+                    self._index(entry)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,105 @@
+"""Background worker that keeps the inbox and subscribed listings warm."""
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def within_budget(reddit, reserve: int, shared_state=None, account=None) -> bool:
+    """Whether more than ``reserve`` requests are left in the rate-limit window.
+
+    With a ``SharedState`` the window of ``account`` that every process on
+    the host draws from counts too, whichever has fewer requests left.
+    """
+    limits = reddit.auth.limits
+    windows = [(limits.get("remaining"), limits.get("reset_timestamp"))]
+    if shared_state is not None and account:
+        windows.append(shared_state.limits(account))
+    now = time.time()
+    return all(
+        remaining is None
+        or remaining >= reserve
+        or (reset_at is not None and now >= reset_at)
+        for remaining, reset_at in windows
+    )
+
+
+class PrefetchWorker(threading.Thread):
+    """Polls the unread inbox and subscribed subreddit listings on a schedule.
+
+    Every ``interval`` seconds the worker refreshes ``api.inbox_cache`` and the
+    ``sorts`` listings of up to ``max_subreddits`` subreddits in
+    ``api.listing_cache``, so the matching commands answer from memory. The
+    cached entries live for two intervals, long enough to survive one skipped
+    poll. Polling pauses whenever the account a refresh will use has fewer
+    than ``reserve`` requests left in the current rate-limit window, keeping
+    that headroom for the agent's own commands.
+    """
+
+    def __init__(
+        self,
+        api,
+        interval: float = 60,
+        subreddits: Optional[Sequence[str]] = None,
+        sorts: Sequence[str] = ("new", "hot"),
+        limit: int = 25,
+        max_subreddits: int = 10,
+        reserve: int = 100,
+    ):
+        super().__init__(name="reddit-prefetch", daemon=True)
+        self.api = api
+        self.interval = interval
+        self.sorts = tuple(sorts)
+        self.limit = limit
+        self.max_subreddits = max_subreddits
+        self.reserve = reserve
+        self.polls = 0
+        self.skipped = 0
+        self._subreddits = list(subreddits or [])
+        self._follow_subscriptions = not subreddits
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning("Reddit prefetch failed: %s", e)
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def poll_once(self) -> None:
+        ttl = self.interval * 2
+        # The inbox is the primary account's, listings go to the next reader
+        if not self._within_budget(self.api.accounts.primary):
+            return
+        self.api.refresh_inbox(ttl=ttl)
+        for name in self._targets():
+            for sort_by in self.sorts:
+                if not self._within_budget():
+                    return
+                self.api.refresh_listing(name, sort_by, self.limit, ttl=ttl)
+        self.polls += 1
+
+    def stats(self) -> dict:
+        return {"polls": self.polls, "skipped": self.skipped}
+
+    def _targets(self) -> List[str]:
+        # Re-read the subscriptions every tenth poll; they rarely change
+        if self._follow_subscriptions and (
+            not self._subreddits or self.polls % 10 == 0
+        ):
+            subreddits = list(self.api.reddit.user.subreddits(limit=None))
+            self.api.subreddit_cache.warm(subreddits)
+            self._subreddits = [sub.display_name for sub in subreddits]
+        return self._subreddits[: self.max_subreddits]
+
+    def _within_budget(self, account=None) -> bool:
+        if self.api.within_budget(self.reserve, account):
+            return True
+        self.skipped += 1
+        return False
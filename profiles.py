@@ -0,0 +1,165 @@
+"""Concurrent, incrementally refreshed user profile snapshots."""
+from concurrent.futures import Executor
+from typing import Dict, List, Optional
+
+from .cache import TTLCache
+from .deadline import submit
+from .records import comment_record, submission_record
+
+PROFILE_ITEMS = 10  # Posts and comments kept per profile snapshot
+PAGE_SIZE = 100  # Largest page Reddit serves, for items newer than a snapshot
+PREFIXES = {"posts": "t3_", "comments": "t1_"}
+
+
+def post_info(post) -> Dict:
+    return {"id": post.id, "title": post.title, "score": post.score}
+
+
+def comment_info(comment) -> Dict:
+    return {
+        "id": comment.id,
+        "parent_id": comment.parent_id,  # Fetching parent ID
+        "post_id": comment.link_id,  # Fetching post ID
+        "body": comment.body,
+        "score": comment.score,
+    }
+
+
+class ProfileTracker:
+    """Loads user profiles and remembers the last snapshot of each user.
+
+    The redditor about page and the new submissions and comments listings are
+    requested concurrently. Once a snapshot exists, the listings only ask for
+    items newer than the newest known fullname (``before``), a page of up to
+    100 at a time, and the scores of the remembered items are refreshed with
+    a single ``/api/info`` request.
+    The karma and every changed item score carry a delta against the snapshot.
+    """
+
+    def __init__(self, reddit, executor: Executor, search_index=None, ttl=86400):
+        self.reddit = reddit
+        self.executor = executor
+        self.search_index = search_index
+        self._snapshots = TTLCache(ttl=ttl, maxsize=100)
+
+    def fetch(self, username: str) -> Dict:
+        key = username.lower()
+        snapshot = self._snapshots.get(key)
+        user = self.reddit.redditor(username)
+
+        # The command's deadline applies to the concurrent requests as well
+        about = submit(self.executor, self._about, user)
+        new_posts = submit(
+            self.executor,
+            self._new_items,
+            user.submissions,
+            self._cursor(snapshot, "posts"),
+        )
+        new_comments = submit(
+            self.executor,
+            self._new_items,
+            user.comments,
+            self._cursor(snapshot, "comments"),
+        )
+        refreshed = submit(self.executor, self._refresh, snapshot)
+
+        about = about.result()
+        refreshed = refreshed.result()
+        new_posts = self._checked(
+            new_posts.result(), snapshot, refreshed, "posts", user.submissions
+        )
+        new_comments = self._checked(
+            new_comments.result(), snapshot, refreshed, "comments", user.comments
+        )
+        if self.search_index is not None:
+            self.search_index.add_posts(submission_record(p) for p in new_posts)
+            self.search_index.add_comments(comment_record(c) for c in new_comments)
+
+        posts = [post_info(post) for post in new_posts]
+        comments = [comment_info(comment) for comment in new_comments]
+        current = {
+            "karma": about["karma"],
+            "posts": self._merge(posts, snapshot, refreshed, "posts"),
+            "comments": self._merge(comments, snapshot, refreshed, "comments"),
+        }
+        self._snapshots.set(key, current)
+        return {**about, **self._with_deltas(current, snapshot)}
+
+    @staticmethod
+    def _about(user) -> Dict:
+        return {
+            "id": user.id,
+            "name": user.name,
+            "karma": user.link_karma + user.comment_karma,
+        }
+
+    @staticmethod
+    def _cursor(snapshot, kind) -> Optional[str]:
+        if snapshot and snapshot[kind]:
+            return PREFIXES[kind] + snapshot[kind][0]["id"]
+        return None
+
+    @staticmethod
+    def _new_items(listing, before: Optional[str]) -> List:
+        if not before:
+            return list(listing.new(limit=PROFILE_ITEMS))
+        # ``before`` returns the items right after the cursor, not the newest,
+        # so page forward until a short page to reach the newest ones
+        items = []
+        while True:
+            page = list(listing.new(limit=PAGE_SIZE, params={"before": before}))
+            items = page + items
+            if len(page) < PAGE_SIZE:
+                return items[:PROFILE_ITEMS]
+            before = page[0].fullname
+
+    def _refresh(self, snapshot) -> Dict[str, object]:
+        if not snapshot:
+            return {}
+        fullnames = [
+            PREFIXES[kind] + item["id"]
+            for kind in ("posts", "comments")
+            for item in snapshot[kind]
+        ]
+        if not fullnames:
+            return {}
+        return {item.fullname: item for item in self.reddit.info(fullnames=fullnames)}
+
+    def _checked(self, items, snapshot, refreshed, kind, listing) -> List:
+        # A deleted cursor item makes Reddit return an empty page for ``before``,
+        # so reload the whole listing when the newest known item disappeared.
+        if items or not snapshot or not snapshot[kind]:
+            return items
+        newest = refreshed.get(self._cursor(snapshot, kind))
+        if newest is not None and newest.author is not None:
+            return items
+        return self._new_items(listing, None)
+
+    @staticmethod
+    def _merge(new_items, snapshot, refreshed, kind) -> List[Dict]:
+        if not snapshot:
+            return new_items
+        builder = post_info if kind == "posts" else comment_info
+        known = []
+        for item in snapshot[kind]:
+            fresh = refreshed.get(PREFIXES[kind] + item["id"])
+            known.append(builder(fresh) if fresh is not None else item)
+        new_ids = {item["id"] for item in new_items}
+        merged = new_items + [item for item in known if item["id"] not in new_ids]
+        return merged[:PROFILE_ITEMS]
+
+    @staticmethod
+    def _with_deltas(current, snapshot) -> Dict:
+        if not snapshot:
+            return current
+        result = {"karma_delta": current["karma"] - snapshot["karma"]}
+        for kind in ("posts", "comments"):
+            previous = {item["id"]: item["score"] for item in snapshot[kind]}
+            # Unchanged scores are left out to keep the response small
+            result[kind] = [
+                {**item, "score_delta": item["score"] - previous[item["id"]]}
+                if previous.get(item["id"], item["score"]) != item["score"]
+                else item
+                for item in current[kind]
+            ]
+        return {**current, **result}
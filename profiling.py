@@ -0,0 +1,154 @@
+"""Opt-in cProfile and tracemalloc sampling of plugin commands.
+
+Profiles are written as ``<command>-<time>-<pid>-<n>.pstats`` and allocation
+snapshots as ``<command>-<time>-<pid>-<n>.tracemalloc``. This file has no package
+imports, so the report also runs on a copy of the dump directory elsewhere:
+
+    python profiling.py ~/.autogpt_reddit/profiles --top 20
+"""
+import argparse
+import cProfile
+import functools
+import glob
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Sequence
+
+MODES = ("cpu", "memory")
+_PROFILER_FILES = (__file__, cProfile.__file__, tracemalloc.__file__)
+
+
+class CommandProfiler:
+    """Wraps selected commands of an object and samples every ``every``-th call.
+
+    ``cpu`` runs the call under cProfile, which only sees the calling thread;
+    work handed to an executor shows up as time spent waiting on futures.
+    ``memory`` traces allocations with tracemalloc, unless another call is
+    already tracing, and keeps what is still allocated when the call returns.
+    """
+
+    def __init__(
+        self,
+        commands: Sequence[str],
+        directory: str,
+        modes: Sequence[str] = ("cpu",),
+        every: int = 1,
+    ):
+        self.commands = set(commands)
+        self.directory = directory
+        self.modes = [mode for mode in modes if mode in MODES]
+        self.every = max(1, every)
+        self._counters: Dict[str, itertools.count] = defaultdict(itertools.count)
+        self._tracing = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def wrap(self, target, names: Sequence[str]) -> None:
+        # "all" profiles every command the plugin registers
+        selected = names if "all" in self.commands else self.commands
+        for name in selected:
+            method = getattr(target, name, None)
+            if callable(method):
+                setattr(target, name, self._wrapped(name, method))
+
+    def _wrapped(self, name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            call = next(self._counters[name])
+            if call % self.every:
+                return method(*args, **kwargs)
+            return self._profile(name, call, method, args, kwargs)
+
+        return profiled
+
+    def _profile(self, name, call, method, args, kwargs):
+        stem = os.path.join(
+            self.directory, f"{name}-{int(time.time())}-{os.getpid()}-{call}"
+        )
+        profiler = cProfile.Profile() if "cpu" in self.modes else None
+        tracing = "memory" in self.modes and self._tracing.acquire(blocking=False)
+        if tracing:
+            tracemalloc.start(10)
+        if profiler:
+            profiler.enable()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(f"{stem}.pstats")
+            if tracing:
+                snapshot = tracemalloc.take_snapshot().filter_traces(
+                    # Leave out the profiler's own bookkeeping
+                    [tracemalloc.Filter(False, f) for f in _PROFILER_FILES]
+                )
+                snapshot.dump(f"{stem}.tracemalloc")
+                tracemalloc.stop()
+                self._tracing.release()
+
+
+def _command_of(path: str) -> str:
+    return os.path.basename(path).rsplit("-", 3)[0]
+
+
+def report(
+    directory: str,
+    top: int = 15,
+    command: Optional[str] = None,
+    sort: str = "cumulative",
+) -> None:
+    """Prints the top ``top`` hotspots per command over every dump in ``directory``."""
+    dumps = defaultdict(lambda: {"pstats": [], "tracemalloc": []})
+    for path in glob.glob(os.path.join(directory, "*.*")):
+        kind = path.rsplit(".", 1)[1]
+        if kind in ("pstats", "tracemalloc") and command in (None, _command_of(path)):
+            dumps[_command_of(path)][kind].append(path)
+
+    for name, files in sorted(dumps.items()):
+        if files["pstats"]:
+            print(f"=== {name}: cpu, {len(files['pstats'])} calls ===")
+            stats = pstats.Stats(*files["pstats"])
+            stats.strip_dirs().sort_stats(sort).print_stats(top)
+        if files["tracemalloc"]:
+            print(f"=== {name}: memory, {len(files['tracemalloc'])} calls ===")
+            sizes = defaultdict(lambda: [0, 0])
+            for path in files["tracemalloc"]:
+                snapshot = tracemalloc.Snapshot.load(path)
+                for stat in snapshot.statistics("lineno"):
+                    size = sizes[str(stat.traceback[0])]
+                    size[0] += stat.size
+                    size[1] += stat.count
+            calls = len(files["tracemalloc"])
+            ranked = sorted(sizes.items(), key=lambda item: item[1][0], reverse=True)
+            for line, (size, count) in ranked[:top]:
+                print(
+                    f"{size / calls / 1024:10.1f} KiB {count // calls:8d} blocks"
+                    f"  {line}"
+                )
+            print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize command profile dumps.")
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=os.path.expanduser(
+            os.path.join(os.getenv("REDDIT_DATA_DIR", "~/.autogpt_reddit"), "profiles")
+        ),
+    )
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--command", help="Only report this command")
+    parser.add_argument(
+        "--sort", default="cumulative", help="pstats sort key, e.g. tottime"
+    )
+    args = parser.parse_args()
+    report(args.directory, args.top, args.command, args.sort)
+
+
+if __name__ == "__main__":
+    main()
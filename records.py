@@ -0,0 +1,45 @@
+"""Plain-dict snapshots of PRAW objects shared by the plugin's local caches."""
+
+
+def submission_record(post) -> dict:
+    # Only call this on submissions that were loaded from a listing or fetched,
+    # otherwise every attribute access below triggers a lazy request.
+    return {
+        "id": post.id,
+        "fullname": f"t3_{post.id}",
+        "title": post.title,
+        "selftext": post.selftext,
+        "url": post.url,
+        "is_self": post.is_self,
+        "score": post.score,
+        "num_comments": post.num_comments,
+        "upvote_ratio": getattr(post, "upvote_ratio", None),
+        "created_utc": post.created_utc,
+        "author": str(post.author),
+        "subreddit": post.subreddit.display_name,
+    }
+
+
+def comment_record(comment) -> dict:
+    return {
+        "id": comment.id,
+        "fullname": f"t1_{comment.id}",
+        "body": comment.body,
+        "score": comment.score,
+        "parent_id": comment.parent_id,
+        "link_id": comment.link_id,
+        "created_utc": comment.created_utc,
+        "author": str(comment.author),
+        "subreddit": comment.subreddit.display_name,
+    }
+
+
+def message_record(message) -> dict:
+    # Inbox items are either comment replies/mentions (t1_) or messages (t4_)
+    return {
+        "fullname": message.fullname,
+        "author": message.author.name if message.author else "Unknown",
+        "body": message.body,
+        "created_utc": message.created_utc,
+        "parent_id": message.parent_id,
+    }
@@ -0,0 +1,177 @@
+"""Retry, backoff, circuit breaker and latency policies for Reddit requests."""
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import prawcore
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504, 520, 522})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Path segments following these hold names or ids, not endpoint structure
+_VARIABLE_AFTER = frozenset({"r", "user", "u", "comments", "message", "duplicates"})
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """``GET /r/python/new.json`` and ``GET /r/rust/new`` share ``GET /r/*/new``."""
+    segments = re.sub(r"\.json$", "", urlsplit(url).path).strip("/").split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1].lower() in _VARIABLE_AFTER:
+            segments[i] = "*"
+    return f"{method.upper()} /{'/'.join(segments)}"
+
+
+class Backoff:
+    """Exponential backoff with full jitter, capped at ``cap`` seconds."""
+
+    def __init__(self, base: float = 0.5, cap: float = 8.0, retries: int = 3):
+        self.base = base
+        self.cap = cap
+        self.retries = retries
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            # The server said how long to wait; jitter only spreads the retries
+            return min(self.cap, retry_after) + random.uniform(0, self.base)
+        return random.uniform(0, min(self.cap, self.base * 2**attempt))
+
+
+class CircuitOpenError(prawcore.exceptions.PrawcoreException):
+    """Raised without a request while an endpoint's circuit breaker is open."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(
+            f"Reddit is failing for {endpoint}, not retrying for {retry_in:.0f} seconds"
+        )
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures of one endpoint.
+
+    While open, requests fail immediately. After ``reset_timeout`` seconds a
+    single trial request is let through; its success closes the circuit and
+    its failure opens it again. A trial that is never sent is given back
+    with ``abort``, and one without an outcome after another
+    ``reset_timeout`` is handed to the next request, so a lost trial cannot
+    keep the circuit half open.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_at = 0.0
+        self._trial_thread = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> float:
+        """Returns 0 if a request may be sent, else the seconds until it may."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                # The trial's own retries go ahead
+                if self._trial_thread == threading.get_ident():
+                    return 0
+                retry_in = self._trial_at + self.reset_timeout - now
+            else:
+                retry_in = self.opened_at + self.reset_timeout - now
+            if retry_in <= 0:
+                self.state = self.HALF_OPEN
+                self._trial_at = now
+                self._trial_thread = threading.get_ident()
+                return 0
+            return max(retry_in, 1)
+
+    def abort(self) -> None:
+        """Gives back a trial this thread took but never finished."""
+        with self._lock:
+            if (
+                self.state == self.HALF_OPEN
+                and self._trial_thread == threading.get_ident()
+            ):
+                self.state = self.OPEN
+                self._trial_thread = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_thread = None
+
+    def record_failure(self) -> bool:
+        """Counts a failure; returns True if it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_thread = None
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Rolling window of one endpoint's response times."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class EndpointPolicies:
+    """Circuit breakers and latency trackers, created per endpoint on demand."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout
+                )
+            return self.breakers[endpoint]
+
+    def latency(self, endpoint: str) -> LatencyTracker:
+        with self._lock:
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = LatencyTracker()
+            return self.latencies[endpoint]
+
+    def open_circuits(self) -> Dict[str, str]:
+        with self._lock:
+            breakers = list(self.breakers.items())
+        return {
+            endpoint: breaker.state
+            for endpoint, breaker in breakers
+            if breaker.state != CircuitBreaker.CLOSED
+        }
@@ -0,0 +1,146 @@
+"""Local SQLite FTS5 index over every post and comment the plugin has fetched."""
+import json
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS post_docs (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+    title, selftext, subreddit, author
+);
+CREATE TABLE IF NOT EXISTS comment_docs (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+    body, subreddit, author
+);
+"""
+
+# Column weights passed to bm25(); a title hit counts far more than a body hit.
+POST_WEIGHTS = "10.0, 1.0, 2.0, 0.5"
+COMMENT_WEIGHTS = "1.0, 2.0, 0.5"
+
+
+class LocalSearchIndex:
+    """BM25-ranked full-text search over post and comment records.
+
+    Records are the dicts built by ``records.submission_record`` and
+    ``records.comment_record``. Re-adding a record with a known id replaces it,
+    so scores stay as fresh as the last fetch. The least recently refreshed
+    documents are evicted once ``max_docs`` is exceeded.
+    """
+
+    def __init__(self, path: str = ":memory:", max_docs: int = 20000):
+        self.max_docs = max_docs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def add_posts(self, records: Iterable[Dict]) -> None:
+        self._add(
+            "post",
+            (
+                (r, (r["title"], r["selftext"], r["subreddit"], r["author"]))
+                for r in records
+            ),
+        )
+
+    def add_comments(self, records: Iterable[Dict]) -> None:
+        self._add(
+            "comment",
+            ((r, (r["body"], r["subreddit"], r["author"])) for r in records),
+        )
+
+    def search_posts(self, query: str, limit: int = 10) -> List[Dict]:
+        return self._search("post", POST_WEIGHTS, query, limit)
+
+    def search_comments(self, query: str, limit: int = 10) -> List[Dict]:
+        return self._search("comment", COMMENT_WEIGHTS, query, limit)
+
+    def get(self, fullname: str) -> Optional[Dict]:
+        """The indexed record of a post (t3_) or comment (t1_), if any."""
+        kinds = {"t3": "post", "t1": "comment"}
+        kind = kinds.get(fullname[:2])
+        if kind is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data FROM {kind}_docs WHERE id = ?", (fullname[3:],)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            (posts,) = self._conn.execute("SELECT COUNT(*) FROM post_docs").fetchone()
+            (comments,) = self._conn.execute(
+                "SELECT COUNT(*) FROM comment_docs"
+            ).fetchone()
+        return posts + comments
+
+    def _add(self, kind, rows) -> None:
+        docs, fts = f"{kind}_docs", f"{kind}_fts"
+        with self._lock, self._conn:
+            for record, columns in rows:
+                data = json.dumps(record, ensure_ascii=False)
+                row = self._conn.execute(
+                    f"SELECT rowid FROM {docs} WHERE id = ?", (record["id"],)
+                ).fetchone()
+                if row:
+                    # Re-insert instead of updating so eviction drops stale docs
+                    self._conn.execute(f"DELETE FROM {fts} WHERE rowid = ?", row)
+                    self._conn.execute(f"DELETE FROM {docs} WHERE rowid = ?", row)
+                rowid = self._conn.execute(
+                    f"INSERT INTO {docs} (id, data) VALUES (?, ?)",
+                    (record["id"], data),
+                ).lastrowid
+                placeholders = ", ".join("?" * (len(columns) + 1))
+                self._conn.execute(
+                    f"INSERT INTO {fts} (rowid, {self._columns(kind)}) "
+                    f"VALUES ({placeholders})",
+                    (rowid, *columns),
+                )
+            self._evict(docs, fts)
+
+    def _evict(self, docs, fts) -> None:
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {docs}").fetchone()
+        overflow = count - self.max_docs
+        if overflow <= 0:
+            return
+        rowids = self._conn.execute(
+            f"SELECT rowid FROM {docs} ORDER BY rowid LIMIT ?", (overflow,)
+        ).fetchall()
+        self._conn.executemany(f"DELETE FROM {fts} WHERE rowid = ?", rowids)
+        self._conn.executemany(f"DELETE FROM {docs} WHERE rowid = ?", rowids)
+
+    @staticmethod
+    def _columns(kind) -> str:
+        if kind == "post":
+            return "title, selftext, subreddit, author"
+        return "body, subreddit, author"
+
+    def _search(self, kind, weights, query, limit) -> List[Dict]:
+        match = self._match_expression(query)
+        if not match:
+            return []
+        docs, fts = f"{kind}_docs", f"{kind}_fts"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT d.data FROM {fts} JOIN {docs} d ON d.rowid = {fts}.rowid "
+                f"WHERE {fts} MATCH ? ORDER BY bm25({fts}, {weights}) LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        # Quote every term so user input can never be parsed as FTS5 syntax.
+        terms = re.findall(r"\w+", query.lower())
+        return " OR ".join(f'"{term}"' for term in terms)
@@ -0,0 +1,46 @@
+"""JSON backend for command output, using orjson when it is installed."""
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+def dumps(value: Any) -> str:
+    if orjson is not None:
+        # orjson writes UTF-8 as is, like json.dumps(..., ensure_ascii=False)
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False)
+
+
+def loads(text: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class CommandResult(str):
+    """The JSON text of a command response that still carries the response dict.
+
+    Commands return it wherever a string is expected, and ``post_command``
+    reads ``payload`` instead of parsing the text again. The text is that of
+    ``shown`` when given, e.g. the response in a compact output format.
+    """
+
+    payload: Dict
+
+    def __new__(cls, payload: Dict, shown: Optional[Any] = None) -> "CommandResult":
+        text = dumps(payload if shown is None else shown)
+        result = super().__new__(cls, text)
+        result.payload = payload
+        return result
+
+
+def payload_of(response: str) -> Any:
+    if isinstance(response, CommandResult):
+        return response.payload
+    return loads(response)
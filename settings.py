@@ -0,0 +1,32 @@
+"""Helpers for reading the plugin's optional settings from the environment."""
+import os
+from typing import List
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.lower() == "true"
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_list(name: str) -> List[str]:
+    value = os.getenv(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def data_dir() -> str:
+    # Plugins are often loaded from a zip file, so state lives outside of it
+    path = os.path.expanduser(os.getenv("REDDIT_DATA_DIR", "~/.autogpt_reddit"))
+    os.makedirs(path, exist_ok=True)
+    return path
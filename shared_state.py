@@ -0,0 +1,259 @@
+"""State shared by every agent process on the host through one SQLite file."""
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable, Optional, Tuple
+
+from .cache import TTLCache
+from .serialization import dumps, loads
+
+_ABSENT = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_limits (
+    account TEXT PRIMARY KEY,
+    remaining REAL,
+    reset_at REAL,
+    last_request_at REAL NOT NULL DEFAULT 0,
+    last_owner TEXT,
+    writes_blocked_until REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS thread_accounts (
+    thread TEXT PRIMARY KEY, account TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS in_flight (
+    key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedState:
+    """Rate-limit windows, cached responses and in-flight markers on disk.
+
+    The database runs in WAL mode, so readers never block the one writer and
+    several agents using the same account behave like a single client: they
+    pace requests against one shared rate-limit window, reuse each other's
+    cached listings and wait for a fetch another agent already started.
+    Expiry uses wall-clock time because monotonic clocks differ per process.
+    Expired rows are purged on open and by ``set`` every ``purge_interval``
+    seconds, so the file does not grow with keys nobody asks for again.
+    """
+
+    def __init__(
+        self, path: str, busy_timeout: float = 5.0, purge_interval: float = 300
+    ):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.purge_interval = purge_interval
+        self.owner = f"{threading.get_native_id()}-{time.time_ns()}"
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+        self.purge()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # Response cache
+
+    def get(self, key: str) -> Any:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+            (key, dumps(value), time.time() + ttl),
+        )
+        if time.time() - self._purged_at >= self.purge_interval:
+            self.purge()
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge(self) -> None:
+        now = self._purged_at = time.time()
+        connection = self._connection()
+        connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        connection.execute("DELETE FROM in_flight WHERE expires_at <= ?", (now,))
+
+    # In-flight markers
+
+    def claim(self, key: str, ttl: float = 30) -> bool:
+        """Marks ``key`` as being fetched; False if another process already is."""
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM in_flight WHERE key = ? AND expires_at <= ?",
+                (key, time.time()),
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO in_flight VALUES (?, ?, ?)",
+                (key, self.owner, time.time() + ttl),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key: str) -> None:
+        self._connection().execute(
+            "DELETE FROM in_flight WHERE key = ? AND owner = ?", (key, self.owner)
+        )
+
+    def wait_released(self, key: str, timeout: float, poll: float = 0.1) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            row = self._connection().execute(
+                "SELECT 1 FROM in_flight WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                return True
+            time.sleep(poll)
+        return False
+
+    # Rate limits
+
+    def record_limits(self, account: str, remaining: float, reset_at: float) -> None:
+        # Requests finish out of order, so only a newer window or a lower
+        # count within the same window replaces what is stored
+        self._connection().execute(
+            """
+            INSERT INTO rate_limits (account, remaining, reset_at) VALUES (?, ?, ?)
+            ON CONFLICT(account) DO UPDATE SET
+                remaining = excluded.remaining, reset_at = excluded.reset_at
+            WHERE rate_limits.reset_at IS NULL
+                OR excluded.reset_at > rate_limits.reset_at + 1
+                OR excluded.remaining < rate_limits.remaining
+            """,
+            (account, remaining, reset_at),
+        )
+
+    def limits(self, account: str) -> Tuple[Optional[float], Optional[float]]:
+        """Requests left to ``account`` across processes, and when they reset."""
+        row = self._connection().execute(
+            "SELECT remaining, reset_at FROM rate_limits WHERE account = ?",
+            (account,),
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def reserve_request(self, account: str) -> float:
+        """Takes the next request slot of ``account``; returns seconds to wait.
+
+        Slots are spread evenly over what is left of the rate-limit window.
+        prawcore already paces the requests of one process, so only a slot
+        taken last by another process adds a delay here.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT remaining, reset_at, last_request_at, last_owner"
+                " FROM rate_limits WHERE account = ?",
+                (account,),
+            ).fetchone()
+            now = time.time()
+            if row is None or row[0] is None or row[1] is None or row[1] <= now:
+                delay = 0.0
+            elif row[0] < 1:
+                delay = row[1] - now
+            elif row[3] == self.owner:
+                delay = 0.0
+            else:
+                delay = max(0.0, row[2] + (row[1] - now) / row[0] - now)
+            connection.execute(
+                """
+                INSERT INTO rate_limits (account, last_request_at, last_owner)
+                VALUES (?, ?, ?)
+                ON CONFLICT(account) DO UPDATE SET
+                    last_request_at = excluded.last_request_at,
+                    last_owner = excluded.last_owner,
+                    remaining = MAX(COALESCE(remaining, 1) - 1, 0)
+                """,
+                (account, now + delay, self.owner),
+            )
+        return delay
+
+    def block_writes(self, account: str, until: float) -> None:
+        self._connection().execute(
+            """
+            INSERT INTO rate_limits (account, writes_blocked_until) VALUES (?, ?)
+            ON CONFLICT(account) DO UPDATE SET writes_blocked_until =
+                MAX(writes_blocked_until, excluded.writes_blocked_until)
+            """,
+            (account, until),
+        )
+
+    def assign_thread(self, thread: str, account: str) -> str:
+        """Assigns ``thread`` to ``account`` unless some account already has it."""
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR IGNORE INTO thread_accounts VALUES (?, ?)", (thread, account)
+            )
+            return connection.execute(
+                "SELECT account FROM thread_accounts WHERE thread = ?", (thread,)
+            ).fetchone()[0]
+
+    def writes_blocked_until(self, account: str) -> float:
+        row = self._connection().execute(
+            "SELECT writes_blocked_until FROM rate_limits WHERE account = ?",
+            (account,),
+        ).fetchone()
+        return row[0] if row else 0.0
+
+
+class SharedCache(TTLCache):
+    """``TTLCache`` backed by ``SharedState``, so other processes see its entries.
+
+    Values must be JSON serializable; tuples come back from other processes
+    as lists. Reads are served from memory when possible.
+    """
+
+    def __init__(
+        self, state: SharedState, namespace: str, ttl: float, maxsize: int = 1024
+    ):
+        super().__init__(ttl, maxsize)
+        self.state = state
+        self.namespace = namespace
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{dumps(key)}"
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = super().get(key, default)
+        if value is not default:
+            return value
+        found = self.state.get(self._shared_key(key))
+        if found is None:
+            return default
+        value, expires_at = found
+        super().set(key, value, expires_at - time.time())
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        super().set(key, value, ttl)
+        self.state.set(self._shared_key(key), value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key: Hashable) -> None:
+        super().delete(key)
+        self.state.delete(self._shared_key(key))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _ABSENT) is not _ABSENT
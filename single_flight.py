@@ -0,0 +1,81 @@
+"""Coalesces identical concurrent calls into one."""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs ``fn`` once per ``key`` at a time; concurrent callers share it.
+
+    A caller arriving while the same key is in flight waits for that call and
+    gets its result, or its exception. Nothing is cached once the call is
+    done, so results are never stale.
+
+    Some failures belong to the caller that ran the call, not to the call:
+    it ran out of its own deadline, say. ``abandoned`` picks those out, and
+    the callers waiting on such a call run it again (one as the new leader)
+    instead of sharing the failure.
+    """
+
+    def __init__(self, abandoned: Optional[Callable[[BaseException], bool]] = None):
+        self.abandoned = abandoned or (lambda error: False)
+        self.leaders = 0
+        self.followers = 0
+        self.rejoined = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None
+    ) -> Any:
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                else:
+                    self.followers += 1
+            if leader:
+                return self._lead(key, call, fn)
+
+            # A follower gives up after ``timeout``; the call goes on for others
+            left = None if give_up_at is None else give_up_at - time.monotonic()
+            if not call.done.wait(left):
+                raise TimeoutError(f"Gave up waiting for {key!r}")
+            if call.error is None:
+                return call.result
+            if not self.abandoned(call.error):
+                raise call.error
+            with self._lock:
+                self.rejoined += 1
+
+    def _lead(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.leaders,
+                "coalesced": self.followers,
+                "rejoined": self.rejoined,
+                "in_flight": len(self._calls),
+            }
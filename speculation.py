@@ -0,0 +1,178 @@
+"""Speculative prefetch of what the agent's next command is likely to read."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Sequence
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class Rule:
+    """After one of the ``after`` commands, warm what ``then`` will need.
+
+    ``predict`` maps the command's output payload to cache keys and ``warm``
+    loads one key into the cache the ``then`` commands read from.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        after: Sequence[str],
+        then: Sequence[str],
+        predict: Callable[[Dict], List[Hashable]],
+        warm: Callable[[Hashable], None],
+    ):
+        self.name = name
+        self.after = frozenset(after)
+        self.then = frozenset(then)
+        self.predict = predict
+        self.warm = warm
+        self.enabled = True
+        self.warmed = 0
+        self.hits = 0
+
+    def hit_rate(self) -> float:
+        return self.hits / self.warmed if self.warmed else 0.0
+
+
+class SpeculativePrefetcher:
+    """Runs ``rules`` on command output and warms their keys in the background.
+
+    ``observe`` is called with every command's output (from ``post_command``)
+    and queues the predicted keys on a single worker thread, one request at
+    a time and only while ``within_budget`` allows. ``before`` is called
+    with the next command (from ``pre_command``): if no rule expects it,
+    queued work that has not started yet is dropped. The cache owner calls
+    ``consumed`` when a command uses a warmed key. Once a rule has warmed
+    ``min_samples`` keys with a hit rate below ``min_hit_rate`` it is
+    switched off.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Rule],
+        within_budget: Callable[[], bool],
+        ttl: float = 120,
+        min_samples: int = 20,
+        min_hit_rate: float = 0.2,
+    ):
+        self.rules = list(rules)
+        self.within_budget = within_budget
+        self.min_samples = min_samples
+        self.min_hit_rate = min_hit_rate
+        self.skipped = 0
+        self.cancelled = 0
+        # Warmed keys not used yet, and the rule that warmed them
+        self._pending = TTLCache(ttl=ttl, maxsize=1000)
+        self._queued = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="reddit-speculate"
+        )
+
+    def before(self, command: str) -> None:
+        if any(rule.enabled and command in rule.then for rule in self.rules):
+            return
+        with self._lock:
+            queued, self._queued = self._queued, []
+        self.cancelled += sum(future.cancel() for future in queued)
+
+    def observe(self, command: str, payload: Dict) -> None:
+        if not isinstance(payload, dict) or payload.get("status") != "success":
+            return
+        for rule in self.rules:
+            if not rule.enabled or command not in rule.after:
+                continue
+            try:
+                keys = rule.predict(payload)
+            except (KeyError, TypeError) as e:
+                logger.debug("Speculation rule %s cannot predict: %s", rule.name, e)
+                continue
+            with self._lock:
+                self._queued = [f for f in self._queued if not f.done()]
+                self._queued += [
+                    self._executor.submit(self._warm, rule, key)
+                    for key in keys
+                    if key not in self._pending
+                ]
+
+    def consumed(self, key: Hashable) -> None:
+        rule = self._pending.get(key)
+        if rule is None:
+            return
+        self._pending.delete(key)
+        rule.hits += 1
+
+    def _warm(self, rule: Rule, key: Hashable) -> None:
+        if not rule.enabled or key in self._pending:
+            return
+        if not self.within_budget():
+            self.skipped += 1
+            return
+        try:
+            rule.warm(key)
+        except Exception as e:
+            logger.warning("Speculative prefetch of %s failed: %s", key, e)
+            return
+        self._pending.set(key, rule)
+        rule.warmed += 1
+        if rule.warmed >= self.min_samples and rule.hit_rate() < self.min_hit_rate:
+            rule.enabled = False
+            logger.info(
+                "Speculation rule %s switched off at a %.0f%% hit rate",
+                rule.name,
+                rule.hit_rate() * 100,
+            )
+
+    def stop(self) -> None:
+        # shutdown(cancel_futures=True) needs Python 3.9
+        with self._lock:
+            queued, self._queued = self._queued, []
+        for future in queued:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "skipped": self.skipped,
+            "cancelled": self.cancelled,
+            "rules": {
+                rule.name: {
+                    "enabled": rule.enabled,
+                    "warmed": rule.warmed,
+                    "hits": rule.hits,
+                    "hit_rate": round(rule.hit_rate(), 3),
+                }
+                for rule in self.rules
+            },
+        }
+
+
+def _ids(payload: Dict, top: int) -> List[str]:
+    return [row["id"] for row in payload.get("data") or []][:top]
+
+
+def default_rules(api, top: int = 3) -> List[Rule]:
+    """The follow-ups agents usually make, warmed through ``api``."""
+    return [
+        Rule(
+            "threads_after_listing",
+            after=("fetch_posts", "search_posts"),
+            then=("fetch_post_details", "fetch_comments"),
+            predict=lambda payload: [
+                ("submission", post_id, "best") for post_id in _ids(payload, top)
+            ],
+            warm=lambda key: api.warm_submission(key[1], key[2]),
+        ),
+        Rule(
+            "inbox_after_notifications",
+            after=("fetch_notifications",),
+            then=("respond_to_notification", "read_notification"),
+            predict=lambda payload: [
+                ("notification", fullname) for fullname in _ids(payload, top)
+            ],
+            warm=lambda key: api.warm_notification(key[1]),
+        ),
+    ]
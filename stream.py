@@ -0,0 +1,210 @@
+"""Streaming ingestion of watched subreddits into bounded ring buffers."""
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .prefetch import within_budget
+from .records import comment_record, submission_record
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100  # Largest page Reddit serves
+EMPTY_POLLS_BEFORE_RESET = 3
+
+
+class RingBuffer:
+    """Bounded buffer of records, newest last, deduplicated by fullname.
+
+    Every accepted record gets an increasing sequence number, which consumers
+    use as their "last seen" cursor. ``complete_since`` is the creation time
+    from which the buffer is known to hold every item; it moves forward when
+    old items are evicted and is cleared when the poller loses its cursor.
+    """
+
+    def __init__(self, maxlen: int):
+        self.seq = 0
+        self.complete_since: Optional[float] = None
+        self._items = deque(maxlen=maxlen)
+        self._fullnames = set()
+
+    def extend(self, records: Sequence[Dict]) -> int:
+        # ``records`` arrive newest first, as Reddit lists them
+        added = 0
+        for record in reversed(records):
+            if record["fullname"] in self._fullnames:
+                continue
+            if len(self._items) == self._items.maxlen:
+                self._fullnames.discard(self._items[0][1]["fullname"])
+            self.seq += 1
+            self._items.append((self.seq, record))
+            self._fullnames.add(record["fullname"])
+            added += 1
+        if records and self.complete_since is None:
+            self.complete_since = min(r["created_utc"] for r in records)
+        if self._items and len(self._items) == self._items.maxlen:
+            self.complete_since = max(
+                self.complete_since or 0, self._items[0][1]["created_utc"]
+            )
+        return added
+
+    def latest(self, limit: int) -> List[Dict]:
+        return [record for _, record in list(self._items)[::-1][:limit]]
+
+    def since(self, seq: int, limit: int) -> Tuple[List[Dict], int, int]:
+        # Oldest first, so a consumer reading in pages never skips an item
+        unseen = [(item_seq, r) for item_seq, r in self._items if item_seq > seq]
+        page = unseen[:limit]
+        last_seq = page[-1][0] if page else seq
+        return [record for _, record in page], last_seq, len(unseen) - len(page)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SubredditStreamer(threading.Thread):
+    """Polls watched subreddits for new posts and comments with a ``before`` cursor.
+
+    Only items newer than the newest one already buffered are requested,
+    page after page until a page comes back short, so an idle subreddit
+    costs two small requests per ``interval``. New items go
+    into one post and one comment ``RingBuffer`` per subreddit, and into the
+    local search index when one is given.
+    """
+
+    def __init__(
+        self,
+        reddit,
+        subreddits: Sequence[str],
+        interval: float = 15,
+        buffer_size: int = 1000,
+        search_index=None,
+        reserve: int = 100,
+        shared_state=None,
+        account: Optional[str] = None,
+    ):
+        super().__init__(name="reddit-stream", daemon=True)
+        self.reddit = reddit
+        self.interval = interval
+        self.search_index = search_index
+        self.reserve = reserve
+        # The rate-limit window other processes on the host share, if any
+        self.shared_state = shared_state
+        self.account = account
+        self.buffers = {
+            (name.lower(), kind): RingBuffer(buffer_size)
+            for name in subreddits
+            for kind in ("posts", "comments")
+        }
+        self._cursors: Dict[Tuple[str, str], Optional[str]] = {}
+        self._empty_polls: Dict[Tuple[str, str], int] = {}
+        self._consumers: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def latest_posts(self, subreddit_name: str, limit: int) -> Optional[List[Dict]]:
+        """The newest ``limit`` posts as buffered, with their scores of then.
+
+        None unless the buffer holds every post since the oldest of them.
+        """
+        with self._lock:
+            buffer = self.buffers.get((subreddit_name.lower(), "posts"))
+            if buffer is None or buffer.complete_since is None or len(buffer) < limit:
+                return None
+            records = buffer.latest(limit)
+            if not records or records[-1]["created_utc"] < buffer.complete_since:
+                return None
+            return records
+
+    def comments_for(self, post_id: str, limit: int) -> Optional[List[Dict]]:
+        # Only answer for posts whose whole comment history is buffered
+        with self._lock:
+            for (name, kind), buffer in self.buffers.items():
+                if kind != "posts":
+                    continue
+                post = next(
+                    (r for r in buffer.latest(len(buffer)) if r["id"] == post_id),
+                    None,
+                )
+                if post is None:
+                    continue
+                comments = self.buffers[(name, "comments")]
+                if (
+                    comments.complete_since is None
+                    or comments.complete_since > post["created_utc"]
+                ):
+                    return None
+                link_id = f"t3_{post_id}"
+                return [
+                    r for r in comments.latest(len(comments)) if r["link_id"] == link_id
+                ][:limit]
+        return None
+
+    def since_last_seen(
+        self, subreddit_name: str, kind: str, limit: int, consumer: str = "agent"
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """Items ``consumer`` has not seen yet and how many more are waiting."""
+        key = (subreddit_name.lower(), kind)
+        with self._lock:
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                return None
+            last_seen = self._consumers.get((*key, consumer), 0)
+            items, seq, remaining = buffer.since(last_seen, limit)
+            self._consumers[(*key, consumer)] = seq
+        return items, remaining
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            for name, kind in list(self.buffers):
+                if not within_budget(
+                    self.reddit, self.reserve, self.shared_state, self.account
+                ):
+                    break
+                try:
+                    self.poll(name, kind)
+                except Exception as e:
+                    logger.warning("Reddit stream poll of r/%s failed: %s", name, e)
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def poll(self, name: str, kind: str) -> int:
+        key = (name, kind)
+        cursor = self._cursors.get(key)
+        added = 0
+        while True:
+            records = self._page(name, kind, cursor)
+            if records:
+                self._cursors[key] = records[0]["fullname"]
+                self._empty_polls[key] = 0
+            elif cursor:
+                # A deleted cursor item makes ``before`` return nothing forever
+                self._empty_polls[key] = self._empty_polls.get(key, 0) + 1
+                if self._empty_polls[key] >= EMPTY_POLLS_BEFORE_RESET:
+                    self._cursors[key] = None
+                    with self._lock:
+                        # Items newer than the lost cursor may never be fetched
+                        self.buffers[key].complete_since = None
+            with self._lock:
+                added += self.buffers[key].extend(records)
+            if self.search_index is not None and records:
+                if kind == "posts":
+                    self.search_index.add_posts(records)
+                else:
+                    self.search_index.add_comments(records)
+            # Without a cursor the newest page is all there is to fetch; with
+            # one, a full page means newer items are still waiting
+            if not cursor or len(records) < PAGE_SIZE or self._stop_event.is_set():
+                return added
+            cursor = records[0]["fullname"]
+
+    def _page(self, name: str, kind: str, cursor: Optional[str]) -> List[Dict]:
+        params = {"before": cursor} if cursor else {}
+        subreddit = self.reddit.subreddit(name)
+        if kind == "posts":
+            items = subreddit.new(limit=PAGE_SIZE, params=params)
+            return [submission_record(item) for item in items]
+        items = subreddit.comments(limit=PAGE_SIZE, params=params)
+        return [comment_record(item) for item in items]
@@ -0,0 +1,104 @@
+"""Long-lived cache of subreddit about data, rules and flair requirements."""
+from typing import Dict, Iterable, List, Optional
+
+import prawcore
+
+from .cache import TTLCache
+
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def subreddit_about(subreddit) -> Dict:
+    return {
+        "id": subreddit.id,
+        "name": subreddit.display_name,
+        "title": subreddit.title,
+        "description": subreddit.description,
+        "subscribers": subreddit.subscribers,
+        "created_utc": subreddit.created_utc,
+        "public_description": subreddit.public_description,
+        "over18": subreddit.over18,
+        "wiki_enabled": subreddit.wiki_enabled,
+        "link_flair_position": getattr(subreddit, "link_flair_position", None),
+    }
+
+
+class SubredditMetadataCache:
+    """Caches what the plugin needs to know about a subreddit before using it.
+
+    Each entry holds up to three independently loaded parts so a cold lookup
+    only pays for what the caller asks for: ``about`` (one request), ``rules``
+    (one request) and ``flair`` (post requirements plus the user selectable
+    link flair templates, two requests).
+    """
+
+    def __init__(self, reddit, ttl: float = DEFAULT_TTL, maxsize: int = 2000):
+        self.reddit = reddit
+        self._entries = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def warm(self, subreddits: Iterable) -> None:
+        # Listing items (e.g. reddit.user.subreddits()) already carry the about
+        # data, so storing them costs no extra requests.
+        for subreddit in subreddits:
+            self._entry(subreddit.display_name)["about"] = subreddit_about(subreddit)
+
+    def about(self, name: str) -> Dict:
+        entry = self._entry(name)
+        if "about" not in entry:
+            entry["about"] = subreddit_about(self.reddit.subreddit(name))
+        return entry["about"]
+
+    def rules(self, name: str) -> List[Dict]:
+        entry = self._entry(name)
+        if "rules" not in entry:
+            entry["rules"] = [
+                {"name": rule.short_name, "description": rule.description}
+                for rule in self.reddit.subreddit(name).rules
+            ]
+        return entry["rules"]
+
+    def flair(self, name: str) -> Dict:
+        entry = self._entry(name)
+        if "flair" not in entry:
+            subreddit = self.reddit.subreddit(name)
+            entry["flair"] = {
+                "required": self._flair_required(subreddit, name),
+                "choices": self._flair_choices(subreddit),
+            }
+        return entry["flair"]
+
+    def invalidate(self, name: str, part: Optional[str] = None) -> None:
+        if part is None:
+            self._entries.delete(name.lower())
+        else:
+            self._entry(name).pop(part, None)
+
+    def stats(self) -> Dict:
+        return self._entries.stats()
+
+    def _flair_required(self, subreddit, name) -> bool:
+        try:
+            return bool(subreddit.post_requirements().get("is_flair_required"))
+        except Exception:
+            # Fall back to the flair display setting from the about data
+            return self.about(name)["link_flair_position"] not in (None, "", "none")
+
+    @staticmethod
+    def _flair_choices(subreddit) -> List[Dict]:
+        try:
+            templates = subreddit.flair.link_templates.user_selectable()
+            return [
+                {"id": flair["flair_template_id"], "text": flair["flair_text"]}
+                for flair in templates
+            ]
+        except prawcore.exceptions.Forbidden:
+            # Users cannot pick flair in this subreddit
+            return []
+
+    def _entry(self, name: str) -> Dict:
+        key = name.lower()
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {}
+            self._entries.set(key, entry)
+        return entry
@@ -0,0 +1,152 @@
+"""Extractive summaries of comment threads, ranked by TF-IDF sentence centrality."""
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .budget import ELLIPSIS, estimate_tokens
+from .thread_tracker import DELETED_BODIES
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = frozenset(
+    """
+    about after again also and any are because been before being both but can
+    could did does doing don't dont down each even for from get got had has
+    have her here him his how i'm i've into it's its just know like make many
+    more most much not now one only other our out over really should some such
+    than that that's the their them then there these they thing think this
+    those too very was way well were what when where which while who why will
+    with would yeah yes you you're your
+    """.split()
+)
+MIN_WORDS = 4  # Shorter sentences ("Thanks, great post!") say little
+MAX_SENTENCE_CHARS = 300
+SCORE_WEIGHT = 0.1  # How much a comment's upvotes raise its sentences
+DUPLICATE_OVERLAP = 0.6  # Word overlap at which a sentence repeats a picked one
+KEY_COMMENTS = 10
+
+
+class ThreadSummarizer:
+    """Picks the most central sentences of a thread until a token budget is spent.
+
+    Each sentence is a TF-IDF vector over the thread's vocabulary. Its
+    centrality is the summed cosine similarity to every other sentence; for
+    unit vectors that is the dot product with their sum, so ranking costs
+    time linear in the number of words rather than quadratic in the number
+    of sentences. Upvotes raise a sentence's rank slightly, near duplicates
+    of picked sentences are skipped and the summary keeps thread order.
+    """
+
+    def __init__(
+        self,
+        count: Callable[[str], int] = estimate_tokens,
+        key_comments: int = KEY_COMMENTS,
+    ):
+        self.count = count
+        self.key_comments = key_comments
+
+    def summarize(self, comments: Sequence[Dict], max_tokens: int) -> Dict:
+        """Summarizes comment records into ``max_tokens``.
+
+        Returns the summary, where every sentence is followed by the id of
+        its comment in brackets, and the ids of the most central comments.
+        """
+        if numpy is None:
+            raise RuntimeError("Thread summaries need numpy (pip install numpy)")
+        texts, owners, words, rows, cols, counts = self._sentences(comments)
+        result = {
+            "summary": "",
+            "key_comments": [],
+            "comments": len(comments),
+            "sentences": len(texts),
+        }
+        if not texts:
+            return result
+
+        votes = numpy.array([max(c["score"] or 0, 0) for c in comments], dtype=float)
+        owners = numpy.array(owners)
+        scores = self._centrality(rows, cols, counts, len(texts))
+        scores *= 1 + SCORE_WEIGHT * numpy.log1p(votes)[owners]
+
+        best = numpy.full(len(comments), -1.0)  # Comments without sentences
+        numpy.maximum.at(best, owners, scores)
+        ranked = numpy.argsort(-best, kind="stable")[: self.key_comments]
+        result["key_comments"] = [comments[i]["id"] for i in ranked if best[i] >= 0]
+
+        remaining = max_tokens - self.count(" ".join(result["key_comments"]))
+        remaining -= 2 * len(result["key_comments"]) + 16  # Keys and punctuation
+        picked: List[int] = []
+        for index in numpy.argsort(-scores, kind="stable"):
+            if remaining < 8:
+                break
+            piece = f"{texts[index]} [{comments[owners[index]]['id']}]"
+            cost = self.count(piece) + 1
+            if cost > remaining or self._repeats(words[index], picked, words):
+                continue
+            picked.append(index)
+            remaining -= cost
+        result["summary"] = " ".join(
+            f"{texts[i]} [{comments[owners[i]]['id']}]" for i in sorted(picked)
+        )
+        return result
+
+    @staticmethod
+    def _sentences(comments: Sequence[Dict]):
+        # Sentences as a sparse term-count matrix in coordinate form
+        texts, owners, words = [], [], []
+        rows, cols, counts = [], [], []
+        vocabulary: Dict[str, int] = {}
+        for owner, comment in enumerate(comments):
+            body = comment["body"] or ""
+            if body in DELETED_BODIES:
+                continue
+            for sentence in SENTENCE_BREAK.split(body):
+                sentence = sentence.strip()
+                terms = [
+                    word
+                    for word in WORD.findall(sentence.lower())
+                    if word not in STOP_WORDS
+                ]
+                if len(terms) < MIN_WORDS:
+                    continue
+                if len(sentence) > MAX_SENTENCE_CHARS:
+                    sentence = sentence[:MAX_SENTENCE_CHARS].rstrip() + ELLIPSIS
+                row = len(texts)
+                texts.append(sentence)
+                owners.append(owner)
+                term_counts = Counter(
+                    vocabulary.setdefault(term, len(vocabulary)) for term in terms
+                )
+                words.append(frozenset(term_counts))
+                rows.extend([row] * len(term_counts))
+                cols.extend(term_counts.keys())
+                counts.extend(term_counts.values())
+        return texts, owners, words, rows, cols, counts
+
+    @staticmethod
+    def _centrality(rows, cols, counts, sentences: int):
+        rows = numpy.array(rows)
+        cols = numpy.array(cols)
+        terms = int(cols.max()) + 1
+        document_frequency = numpy.bincount(cols, minlength=terms)
+        idf = numpy.log((1 + sentences) / (1 + document_frequency)) + 1
+        values = (1 + numpy.log(numpy.array(counts, dtype=float))) * idf[cols]
+        norms = numpy.sqrt(numpy.bincount(rows, values**2, minlength=sentences))
+        values /= norms[rows]
+        total = numpy.bincount(cols, values, minlength=terms)
+        # Similarity to the sum of all sentences, minus each one's own
+        centrality = numpy.bincount(rows, values * total[cols], minlength=sentences)
+        return numpy.maximum(centrality - 1, 0)
+
+    @staticmethod
+    def _repeats(terms, picked: List[int], words) -> bool:
+        for index in picked:
+            overlap = len(terms & words[index]) / len(terms | words[index])
+            if overlap >= DUPLICATE_OVERLAP:
+                return True
+        return False
@@ -0,0 +1,26 @@
+"""Loads the plugin's modules as package ``autogpt_reddit`` for the tests.
+
+The checkout's directory name need not be a valid package name, so the
+modules are loaded under a bare package that skips the plugin's __init__,
+as ``benchmarks/replay.py`` does.
+"""
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "autogpt_reddit" not in sys.modules:
+    package = types.ModuleType("autogpt_reddit")
+    package.__path__ = [ROOT]
+    sys.modules["autogpt_reddit"] = package
+
+
+def plugin(data_dir: str, **env):
+    """An AutoGPTReddit keeping its files in ``data_dir``; sends no request."""
+    from unittest import mock
+
+    from autogpt_reddit.AutoGPTReddit import AutoGPTReddit
+
+    with mock.patch.dict(os.environ, {"REDDIT_DATA_DIR": data_dir, **env}):
+        return AutoGPTReddit("id", "secret", "autogpt-reddit tests", "bot", "pw")
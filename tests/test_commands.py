@@ -0,0 +1,132 @@
+"""Commands of AutoGPTReddit that must answer without a working Reddit."""
+import json
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+import support
+
+
+def comment(comment_id, body):
+    return {
+        "id": comment_id,
+        "fullname": f"t1_{comment_id}",
+        "body": body,
+        "score": 3,
+        "parent_id": "t3_1abcde",
+        "link_id": "t3_1abcde",
+        "created_utc": time.time() - 60,
+        "author": "someone",
+        "subreddit": "python",
+    }
+
+
+class FakeItem:
+    def __init__(self, fullname, likes=None, votable=True):
+        self.fullname = fullname
+        self.id = fullname[3:]
+        self._likes = likes
+        self._votable = votable
+        self.votes = []
+
+    @property
+    def likes(self):
+        if not self._votable:
+            raise AttributeError("'Subreddit' object has no attribute 'likes'")
+        return self._likes
+
+    def upvote(self):
+        self.votes.append("upvote")
+
+
+class CommandsTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        self.reddit = support.plugin(self.data_dir.name)
+        self.addCleanup(self.reddit.executor.shutdown)
+        # No reconciliation of the ledger in the background
+        self.reddit.ledger.reconciled_at = time.time()
+
+    def serve(self, *items):
+        def info(reddit, fullnames):
+            self.looked_up.extend(fullnames)
+            return {i.fullname: i for i in items if i.fullname in fullnames}
+
+        self.looked_up = []
+        self.reddit._info = info
+
+    def run_command(self, name, **args):
+        return json.loads(str(getattr(self.reddit, name)(args)))
+
+    def test_search_comments_is_local(self):
+        self.reddit.search_index.add_comments(
+            [comment("k1", "asyncio event loops"), comment("k2", "gardening tips")]
+        )
+        response = self.run_command("search_comments", query="asyncio")
+        self.assertEqual(response["status"], "success")
+        self.assertEqual([row["id"] for row in response["data"]], ["k1"])
+
+    def test_remote_comment_search_is_refused(self):
+        for scope in ("remote", "hybrid"):
+            with self.subTest(scope=scope):
+                response = self.run_command("search_comments", query="x", scope=scope)
+                self.assertEqual(response["status"], "error")
+                self.assertIn("unsupported", response["message"])
+
+    def test_vote_batch_reports_each_item(self):
+        post, voted, odd = (
+            FakeItem("t3_a1"),
+            FakeItem("t1_b2", likes=True),
+            FakeItem("t1_c3", votable=False),
+        )
+        self.serve(post, voted, odd)
+        ids = "a1,t1_b2,t1_c3,t5_2qh0u"
+        response = self.run_command("vote_batch", ids=ids, action="upvote")
+        self.assertEqual(response["status"], "success")
+        statuses = {row["id"]: row["status"] for row in response["data"]}
+        self.assertEqual(
+            statuses,
+            {
+                "t3_a1": "voted",
+                "t1_b2": "unchanged",
+                "t1_c3": "error",
+                "t5_2qh0u": "invalid",
+            },
+        )
+        self.assertEqual(post.votes, ["upvote"])
+        self.assertNotIn("t5_2qh0u", self.looked_up)
+
+    def test_fetch_items_reports_other_kinds_as_invalid(self):
+        self.serve()
+        response = self.run_command("fetch_items", ids="t5_2qh0u,t2_abc,t3_gone")
+        self.assertEqual(response["status"], "success")
+        self.assertEqual(response["invalid"], ["t5_2qh0u", "t2_abc"])
+        self.assertEqual(response["missing"], ["t3_gone"])
+        self.assertEqual(self.looked_up, ["t3_gone"])
+
+    def test_inbox_is_fetched_fresh_by_default(self):
+        listed = []
+
+        def unread(limit):
+            listed.append(limit)
+            return [
+                SimpleNamespace(
+                    fullname="t4_m1",
+                    author=SimpleNamespace(name="someone"),
+                    body="hello",
+                    created_utc=time.time() - 60,
+                    parent_id=None,
+                )
+            ]
+
+        self.reddit.reddit.inbox = SimpleNamespace(unread=unread)
+        for _ in range(2):
+            response = self.run_command("fetch_notifications")
+            self.assertEqual([row["id"] for row in response["data"]], ["t4_m1"])
+        self.assertEqual(len(listed), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
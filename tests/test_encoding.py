@@ -0,0 +1,121 @@
+"""Round trips of command responses through the compact output formats."""
+import unittest
+
+import support  # noqa: F401
+from autogpt_reddit.encoding import (
+    FORMATS,
+    compact_response,
+    expand_response,
+    from_tsv,
+    to_tsv,
+)
+from autogpt_reddit.serialization import dumps, loads
+
+# Responses shaped like those of fetch_posts, fetch_comments, search_comments
+# and fetch_subreddit_info, with the values that are easy to get wrong
+RESPONSES = [
+    {
+        "status": "success",
+        "data": [
+            {
+                "id": "1abcde",
+                "title": "Is 42 the answer?",
+                "text": "Line one\nline\ttwo with a \\ backslash",
+                "score": 1234,
+                "comments_count": 0,
+                "age": "3 hours",
+                "relevance": 0.8125,
+            },
+            {
+                "id": "123",
+                "title": "",
+                "text": "null",
+                "score": -2,
+                "comments_count": 17,
+                "age": "true",
+                "relevance": -0.0625,
+            },
+            {
+                "id": "1abcdf",
+                "title": '"quoted" title',
+                "text": "[1, 2]",
+                "score": 0,
+                "comments_count": 3,
+                "age": " 7",
+                "relevance": 0.0,
+            },
+        ],
+        "partial": True,
+        "cursor": "t3_1abcdf",
+    },
+    {
+        "status": "success",
+        "data": [
+            {
+                "Comment ID": "k1",
+                "Content": "A literal \\n is not a newline",
+                "score": 5,
+                "Author": None,
+                "age": "2 days",
+            },
+            {
+                "Comment ID": "k2",
+                "Content": "Ends with a backslash \\",
+                "score": 1,
+                "Author": "someone",
+                "age": "1 minutes",
+            },
+        ],
+    },
+    {
+        "status": "success",
+        "data": [
+            {
+                "id": "k3",
+                "content": "Emoji 🙂 and ümlauts",
+                "score": 12,
+                "parent_id": "t3_1abcde",
+                "age": "5 seconds",
+            },
+        ],
+    },
+    {
+        "status": "success",
+        "data": [{"name": "python", "rules": ["Be nice", "No spam"], "nsfw": False}],
+    },
+]
+
+
+class EncodingTest(unittest.TestCase):
+    def test_round_trip(self):
+        for response in RESPONSES:
+            for output_format in FORMATS:
+                with self.subTest(output_format=output_format):
+                    sent = dumps(compact_response(response, output_format))
+                    self.assertEqual(expand_response(loads(sent)), response)
+
+    def test_tsv_keeps_strings_apart_from_values(self):
+        for text, value in [
+            ("123", 123),
+            ("", None),
+            ("null", None),
+            ("false", False),
+            ("1.5", 1.5),
+        ]:
+            with self.subTest(text=text):
+                rows = [{"a": text, "b": value}]
+                decoded = from_tsv(to_tsv(rows))
+                self.assertEqual(decoded, rows)
+                self.assertIsInstance(decoded[0]["a"], str)
+
+    def test_tsv_is_one_line_per_row(self):
+        rows = RESPONSES[0]["data"]
+        self.assertEqual(len(to_tsv(rows).split("\n")), len(rows) + 1)
+
+    def test_mixed_rows_stay_json(self):
+        response = {"status": "success", "data": [{"a": 1}, {"b": 2}]}
+        self.assertIs(compact_response(response, "tsv"), response)
+
+
+if __name__ == "__main__":
+    unittest.main()
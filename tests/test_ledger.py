@@ -0,0 +1,40 @@
+"""Loading and querying the activity ledger."""
+import os
+import tempfile
+import unittest
+
+import support  # noqa: F401
+from autogpt_reddit.ledger import ActivityLedger
+
+
+class ActivityLedgerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "ledger.jsonl")
+
+    def test_truncated_line_is_skipped(self):
+        ledger = ActivityLedger(self.path)
+        ledger.record("reply", fullname="t1_a", parent="t3_p", content="first")
+        with open(self.path, "a", encoding="utf-8") as ledger_file:
+            ledger_file.write('{"action": "reply", "id": "t1_b", "par')
+        with self.assertLogs("autogpt_reddit.ledger", "WARNING"):
+            ledger = ActivityLedger(self.path)
+        self.assertEqual([e["id"] for e in ledger.replies_to("t3_p")], ["t1_a"])
+        # The next entry starts on a line of its own
+        ledger.record("reply", fullname="t1_c", parent="t3_p", content="second")
+        with self.assertLogs("autogpt_reddit.ledger", "WARNING"):
+            ledger = ActivityLedger(self.path)
+        ids = [entry["id"] for entry in ledger.replies_to("t3_p")]
+        self.assertEqual(ids, ["t1_a", "t1_c"])
+
+    def test_post_duplicates_ignore_subreddit_case(self):
+        ledger = ActivityLedger(self.path)
+        ledger.record("post", fullname="t3_a", target="r/Python", content="hi")
+        ledger = ActivityLedger(self.path)
+        self.assertEqual(len(ledger.duplicates("r/python", "hi")), 1)
+        self.assertEqual(ledger.duplicates("r/python", "other"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Incremental profile listings, against a fake Reddit listing."""
+import unittest
+from types import SimpleNamespace
+
+import support  # noqa: F401
+from autogpt_reddit.profiles import PAGE_SIZE, PROFILE_ITEMS, ProfileTracker
+
+
+class FakeListing:
+    def __init__(self, count):
+        # Oldest first
+        self.items = [SimpleNamespace(fullname=f"t3_p{n}") for n in range(count)]
+        self.requests = 0
+
+    def new(self, limit, params=None):
+        # Like Reddit: the ``limit`` items right after ``before``, newest first
+        self.requests += 1
+        fullnames = [item.fullname for item in self.items]
+        if params and "before" in params:
+            newer = self.items[fullnames.index(params["before"]) + 1 :]
+            return newer[:limit][::-1]
+        return self.items[-limit:][::-1]
+
+
+class ProfileTrackerTest(unittest.TestCase):
+    def test_new_items_are_the_newest(self):
+        for count, requests in [(5, 1), (PAGE_SIZE * 2 + 30, 3)]:
+            with self.subTest(count=count):
+                listing = FakeListing(1 + count)
+                items = ProfileTracker._new_items(listing, "t3_p0")
+                expected = [f"t3_p{n}" for n in range(count, 0, -1)][:PROFILE_ITEMS]
+                self.assertEqual([item.fullname for item in items], expected)
+                self.assertEqual(listing.requests, requests)
+
+    def test_first_load_takes_the_newest_page(self):
+        listing = FakeListing(50)
+        items = ProfileTracker._new_items(listing, None)
+        self.assertEqual(items[0].fullname, "t3_p49")
+        self.assertEqual(len(items), PROFILE_ITEMS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Expiry of rows in the SQLite file shared between agents."""
+import os
+import tempfile
+import time
+import unittest
+
+import support  # noqa: F401
+from autogpt_reddit.shared_state import SharedState
+
+
+class SharedStateTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "shared.sqlite3")
+
+    def rows(self, state):
+        query = "SELECT key FROM cache ORDER BY key"
+        return [key for key, in state._connection().execute(query)]
+
+    def test_expired_rows_are_purged_by_set(self):
+        state = SharedState(self.path, purge_interval=0)
+        state.set("old", 1, ttl=-1)
+        state.set("new", 2, ttl=60)
+        self.assertEqual(self.rows(state), ["new"])
+
+    def test_expired_rows_are_purged_on_open(self):
+        state = SharedState(self.path, purge_interval=3600)
+        state.set("old", 1, ttl=0.01)
+        state.set("new", 2, ttl=60)
+        time.sleep(0.02)
+        self.assertEqual(self.rows(state), ["new", "old"])
+        self.assertEqual(self.rows(SharedState(self.path)), ["new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
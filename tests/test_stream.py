@@ -0,0 +1,71 @@
+"""Polling watched subreddits with a ``before`` cursor, against a fake Reddit."""
+import unittest
+from types import SimpleNamespace
+
+import support  # noqa: F401
+from autogpt_reddit.stream import PAGE_SIZE, SubredditStreamer
+
+
+def post(number):
+    return SimpleNamespace(
+        id=f"p{number}",
+        title=f"Post {number}",
+        selftext="",
+        url="",
+        is_self=True,
+        score=1,
+        num_comments=0,
+        upvote_ratio=1.0,
+        created_utc=1_700_000_000 + number,
+        author="someone",
+        subreddit=SimpleNamespace(display_name="python"),
+    )
+
+
+class FakeSubreddit:
+    def __init__(self):
+        self.posts = []  # Oldest first
+        self.requests = 0
+
+    def publish(self, count):
+        start = len(self.posts)
+        self.posts += [post(number) for number in range(start, start + count)]
+
+    def new(self, limit, params):
+        # Like Reddit: the ``limit`` items right after ``before``, newest first
+        self.requests += 1
+        fullnames = [f"t3_{p.id}" for p in self.posts]
+        if "before" in params:
+            newer = self.posts[fullnames.index(params["before"]) + 1 :]
+            return newer[:limit][::-1]
+        return self.posts[-limit:][::-1]
+
+
+class SubredditStreamerTest(unittest.TestCase):
+    def setUp(self):
+        self.subreddit = FakeSubreddit()
+        reddit = SimpleNamespace(subreddit=lambda name: self.subreddit)
+        self.streamer = SubredditStreamer(reddit, ["python"])
+
+    def test_pages_until_a_short_page(self):
+        self.subreddit.publish(150)
+        self.assertEqual(self.streamer.poll("python", "posts"), PAGE_SIZE)
+        self.subreddit.publish(2 * PAGE_SIZE + 50)
+        self.subreddit.requests = 0
+        self.assertEqual(self.streamer.poll("python", "posts"), 2 * PAGE_SIZE + 50)
+        self.assertEqual(self.subreddit.requests, 3)
+
+        posts = self.streamer.latest_posts("python", 3 * PAGE_SIZE + 50)
+        expected = [f"p{n}" for n in range(399, 49, -1)]
+        self.assertEqual([record["id"] for record in posts], expected)
+
+    def test_idle_subreddit_costs_one_request(self):
+        self.subreddit.publish(10)
+        self.streamer.poll("python", "posts")
+        self.subreddit.requests = 0
+        self.assertEqual(self.streamer.poll("python", "posts"), 0)
+        self.assertEqual(self.subreddit.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Circuit breaking in ResilientRequestor, without talking to Reddit."""
+import time
+import unittest
+
+import praw
+
+import support  # noqa: F401
+from autogpt_reddit import deadline
+from autogpt_reddit.deadline import DeadlineExceeded
+from autogpt_reddit.resilience import CircuitBreaker, CircuitOpenError
+from autogpt_reddit.transport import ResilientRequestor, disable_session_retries
+
+URL = "https://oauth.reddit.com/r/python/new"
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class FakeRequestor(ResilientRequestor):
+    def __init__(self, statuses, **kwargs):
+        super().__init__(user_agent="autogpt-reddit tests", retries=0, **kwargs)
+        self.statuses = list(statuses)
+        self.sent = 0
+
+    def _transmit(self, *args, **kwargs):
+        self.sent += 1
+        return FakeResponse(self.statuses.pop(0))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_aborted_trial_is_given_back(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.allow(), 0)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.abort()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.allow(), 0)
+
+    def test_lost_trial_expires(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertEqual(breaker.allow(), 0)
+        # Another thread asking while the trial is out is turned away...
+        breaker._trial_thread = object()
+        self.assertGreater(breaker.allow(), 0)
+        # ...until the trial had reset_timeout to finish
+        time.sleep(0.06)
+        self.assertEqual(breaker.allow(), 0)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class ResilientRequestorTest(unittest.TestCase):
+    def test_trial_past_the_deadline_does_not_wedge_the_circuit(self):
+        requestor = FakeRequestor([503, 200], failure_threshold=1, reset_timeout=0.05)
+        self.assertEqual(requestor.request("GET", URL).status_code, 503)
+        with self.assertRaises(CircuitOpenError):
+            requestor.request("GET", URL)
+        time.sleep(0.06)
+        with deadline.deadline(-1):
+            with self.assertRaises(DeadlineExceeded):
+                requestor.request("GET", URL)
+        self.assertEqual(requestor.sent, 1)
+        self.assertEqual(requestor.request("GET", URL).status_code, 200)
+        self.assertEqual(requestor.stats()["open_circuits"], {})
+
+    def test_session_makes_a_single_attempt(self):
+        reddit = praw.Reddit(
+            client_id="id", client_secret="secret", user_agent="autogpt-reddit tests"
+        )
+        disable_session_retries(reddit)
+        strategy = reddit._read_only_core._retry_strategy_class()
+        self.assertFalse(strategy.should_retry_on_failure())
+        self.assertIsNone(strategy._sleep_seconds())
+
+
+if __name__ == "__main__":
+    unittest.main()
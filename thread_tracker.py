@@ -0,0 +1,82 @@
+"""Snapshots of read threads, so re-reading one only returns what changed."""
+from typing import Dict, Iterable, Optional
+
+from .cache import TTLCache
+from .ledger import content_hash
+
+DELETED_BODIES = ("[deleted]", "[removed]")
+
+
+class ThreadTracker:
+    """Remembers the post and comments last returned for each thread.
+
+    ``diff`` compares fresh records with that snapshot and reports new
+    comments, score and upvote ratio changes, edits and deletions, then
+    stores the fresh state. Comments missing from a later read are not
+    reported as deleted, since listings are limited and sorted differently;
+    a comment is deleted once Reddit returns it as ``[deleted]`` or
+    ``[removed]``.
+    """
+
+    def __init__(self, ttl: float = 86400, maxsize: int = 200):
+        self._snapshots = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def diff(
+        self, post_id: str, post: Optional[Dict] = None, comments: Iterable[Dict] = ()
+    ) -> Dict:
+        snapshot = self._snapshots.get(post_id)
+        first_read = snapshot is None
+        snapshot = snapshot or {"post": None, "comments": {}}
+        result = {"first_read": first_read, "post": None}
+        result.update(new=[], changed=[], deleted=[])
+
+        if post is not None:
+            current = {
+                "score": post["score"],
+                "upvote_ratio": post["upvote_ratio"],
+                "num_comments": post["num_comments"],
+                "hash": content_hash(post["selftext"]),
+            }
+            if snapshot["post"] is not None:
+                result["post"] = self._post_changes(snapshot["post"], current, post)
+            snapshot["post"] = current
+
+        for comment in comments:
+            fullname = comment["fullname"]
+            known = snapshot["comments"].get(fullname)
+            deleted = comment["body"] in DELETED_BODIES
+            current = {"score": comment["score"], "hash": content_hash(comment["body"])}
+            snapshot["comments"][fullname] = current
+            if known is None:
+                if not deleted:
+                    result["new"].append(comment)
+            elif deleted and known["hash"] != current["hash"]:
+                result["deleted"].append(comment["id"])
+            elif known != current:
+                result["changed"].append(
+                    {
+                        "record": comment,
+                        "score_delta": current["score"] - known["score"],
+                        "edited": known["hash"] != current["hash"],
+                    }
+                )
+
+        self._snapshots.set(post_id, snapshot)
+        return result
+
+    @staticmethod
+    def _post_changes(known: Dict, current: Dict, post: Dict) -> Dict:
+        changes = {}
+        if current["score"] != known["score"]:
+            changes["score"] = current["score"]
+            changes["score_delta"] = current["score"] - known["score"]
+        if current["upvote_ratio"] != known["upvote_ratio"]:
+            changes["upvote_ratio"] = current["upvote_ratio"]
+        if current["num_comments"] != known["num_comments"]:
+            changes["comments_count"] = current["num_comments"]
+            changes["comments_count_delta"] = (
+                current["num_comments"] - known["num_comments"]
+            )
+        if current["hash"] != known["hash"]:
+            changes["content"] = post["selftext"]
+        return changes
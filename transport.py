@@ -0,0 +1,290 @@
+"""prawcore requestor adding retries, circuit breakers, hedging and coalescing."""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+import prawcore
+import requests
+from prawcore.sessions import RetryStrategy
+
+from . import deadline
+from .deadline import DeadlineExceeded
+from .resilience import (
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUS,
+    Backoff,
+    CircuitOpenError,
+    EndpointPolicies,
+    endpoint_key,
+)
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def _normalized(params) -> tuple:
+    if not params:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in dict(params).items()))
+
+
+class _SingleAttempt(RetryStrategy):
+    # prawcore's FiniteRetryStrategy with fewer than its default retries also
+    # sleeps before the first attempt
+    def _sleep_seconds(self) -> Optional[float]:
+        return None
+
+    def consume_available_retry(self) -> "_SingleAttempt":
+        return self
+
+    def should_retry_on_failure(self) -> bool:
+        return False
+
+
+def disable_session_retries(reddit) -> None:
+    """Leaves every retry of ``reddit``'s requests to ``ResilientRequestor``.
+
+    prawcore's Session retries 5xx responses, connection errors and read
+    timeouts by itself, for writes as well, before the requestor sees the
+    outcome. With a single attempt per call it passes them straight on.
+    """
+    for name in ("_authorized_core", "_read_only_core"):
+        session = getattr(reddit, name, None)
+        if session is not None:
+            session._retry_strategy_class = _SingleAttempt
+
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class ResilientRequestor(prawcore.Requestor):
+    """Every HTTP request PRAW makes passes through ``request`` below.
+
+    * Idempotent reads are retried on connection errors and on 429/5xx
+      responses with jittered exponential backoff, honouring Retry-After.
+      Writes are only retried after a 429 response or a connection timeout,
+      when Reddit cannot have acted on them. This holds only with prawcore's
+      own retries switched off, see ``disable_session_retries``.
+    * Each endpoint (path with names and ids replaced by ``*``) has a circuit
+      breaker; while it is open requests fail at once with
+      ``CircuitOpenError`` instead of waiting on an outage. A request counts
+      as one failure once its retries are used up, however many it took.
+    * With ``hedge`` on, a read still running after the endpoint's p95
+      latency is sent a second time and the first response wins.
+
+    Identical reads running at the same time (same method, URL and
+    parameters) share one request and its response.
+
+    The deadline of the running command (see deadline.py) caps every
+    request's timeout, retry wait and rate-limit wait; once it has passed,
+    ``DeadlineExceeded`` is raised instead of sending another request.
+
+    With a ``SharedState``, requests of ``account`` are paced against the
+    rate-limit window shared with every other process on the host.
+
+    Pass it to ``praw.Reddit`` as ``requestor_class``; the keyword arguments
+    go in ``requestor_kwargs``. Then call ``disable_session_retries`` on the
+    client so requests are not retried twice.
+    """
+
+    def __init__(
+        self,
+        *args,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        hedge: bool = False,
+        shared_state=None,
+        account: Optional[str] = None,
+        registry: Optional[dict] = None,
+        recorder=None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.backoff = Backoff(backoff, max_backoff, retries)
+        self.policies = EndpointPolicies(failure_threshold, reset_timeout)
+        self.hedge = hedge
+        self.shared_state = shared_state
+        self.account = account
+        self.single_flight = SingleFlight(abandoned=self._leader_gave_up)
+        # A CassetteRecorder that keeps every exchange, see cassette.py
+        self.recorder = recorder
+        if registry is not None:
+            registry[account] = self
+        self._hedge_pool = None
+        self._stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+        self._stats_lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        method, url = args[0], args[1]
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return self._request(*args, **kwargs)
+        # Responses are fully read before they are returned, so sharing is safe
+        key = (method.upper(), url, _normalized(kwargs.get("params")))
+        try:
+            return self.single_flight.do(
+                key, lambda: self._request(*args, **kwargs), deadline.remaining()
+            )
+        except TimeoutError:
+            if deadline.expired():
+                raise DeadlineExceeded() from None
+            raise
+
+    def _request(self, *args, **kwargs):
+        method, url = args[0], args[1]
+        endpoint = endpoint_key(method, url)
+        breaker = self.policies.breaker(endpoint)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        attempt = 0
+        try:
+            while True:
+                retry_in = breaker.allow()
+                if retry_in:
+                    raise CircuitOpenError(endpoint, retry_in)
+                sent_at = self._reserve()
+                if idempotent:
+                    kwargs["timeout"] = deadline.timeout(kwargs.get("timeout"))
+                else:
+                    # A write cut short might still be carried out, so it gets
+                    # its full timeout once sent
+                    deadline.check()
+                self._count("requests")
+                response, error = None, None
+                try:
+                    response = self._send(endpoint, idempotent, args, kwargs)
+                except prawcore.exceptions.RequestException as e:
+                    error = e
+                if response is not None:
+                    self._share_limits(response, sent_at)
+
+                if error is None and response.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    return response
+                if attempt >= self.backoff.retries or not self._retryable(
+                    idempotent, response, error
+                ):
+                    if breaker.record_failure():
+                        logger.warning("Circuit breaker opened for %s", endpoint)
+                    # prawcore turns the final status into its usual exception
+                    if error is not None:
+                        raise error
+                    return response
+                delay = self.backoff.delay(attempt, _retry_after(response))
+                logger.info("Retrying %s in %.1f seconds", endpoint, delay)
+                self._sleep(delay)
+                attempt += 1
+                self._count("retries")
+        except BaseException:
+            # A trial request that never got an outcome must not keep the
+            # circuit half open
+            breaker.abort()
+            raise
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["open_circuits"] = self.policies.open_circuits()
+        stats.update(self.single_flight.stats())
+        return stats
+
+    def _reserve(self) -> float:
+        if self.shared_state is not None and self.account:
+            delay = self.shared_state.reserve_request(self.account)
+            if delay > 0:
+                logger.info("Waiting %.1f seconds for the shared rate limit", delay)
+                self._sleep(delay)
+        return time.time()
+
+    @staticmethod
+    def _sleep(seconds: float) -> None:
+        # Waiting past the deadline would only delay the inevitable
+        left = deadline.remaining()
+        if left is not None and seconds >= left:
+            raise DeadlineExceeded()
+        time.sleep(seconds)
+
+    def _share_limits(self, response, sent_at: float) -> None:
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if self.shared_state is None or not self.account or not remaining or not reset:
+            return
+        self.shared_state.record_limits(
+            self.account, float(remaining), sent_at + float(reset)
+        )
+
+    def _send(self, endpoint, idempotent, args, kwargs):
+        latency = self.policies.latency(endpoint)
+        p95 = latency.percentile(0.95) if self.hedge and idempotent else None
+        start = time.monotonic()
+        if p95 is None:
+            response = self._transmit(*args, **kwargs)
+        else:
+            response = self._hedged(p95, args, kwargs)
+        latency.add(time.monotonic() - start)
+        return response
+
+    def _hedged(self, delay, args, kwargs):
+        with self._stats_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="reddit-hedge"
+                )
+        send = self._transmit
+        first = self._hedge_pool.submit(send, *args, **kwargs)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = self._hedge_pool.submit(send, *args, **kwargs)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        if winner is second:
+            self._count("hedge_wins")
+        if winner.exception() is not None:
+            # One failed quickly; the slower one may still succeed
+            other = first if winner is second else second
+            return other.result()
+        return winner.result()
+
+    def _transmit(self, *args, **kwargs):
+        # The actual HTTP request; replaced when replaying a cassette
+        if self.recorder is None:
+            return super().request(*args, **kwargs)
+        start = time.monotonic()
+        response = super().request(*args, **kwargs)
+        self.recorder.http(args[0], args[1], kwargs, response, time.monotonic() - start)
+        return response
+
+    @staticmethod
+    def _leader_gave_up(error) -> bool:
+        # The deadline of the command that sent a shared read, or a timeout it
+        # shortened, says nothing about the read; the others send it again
+        if isinstance(error, DeadlineExceeded):
+            return True
+        original = getattr(error, "original_exception", None)
+        return isinstance(original, requests.exceptions.Timeout)
+
+    @staticmethod
+    def _retryable(idempotent, response, error) -> bool:
+        if idempotent:
+            return True
+        if error is not None:
+            # Any later failure may come after Reddit received the request
+            return isinstance(
+                error.original_exception, requests.exceptions.ConnectTimeout
+            )
+        return response.status_code == 429
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1